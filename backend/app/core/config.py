@@ -3,9 +3,69 @@ from pathlib import Path
 
 class Settings(BaseSettings):
     PROJECT_NAME: str = "AVA Chatbot"
+    WARMUP_ON_STARTUP: bool = True  # load models in the background after startup instead of on first use
+    LOG_LEVEL: str = "INFO"  # DEBUG also logs per-stage timings and the context sent to Ollama
     DOCS_DIR: str = str(Path(__file__).parent.parent.parent / "docs")
     VECTOR_STORE_DIR: str = str(Path(__file__).parent.parent.parent / "vectorstore")
+    FILES_DIR: str = str(Path(__file__).parent.parent / "files")  # uploaded files, inside app/files
+    UPLOAD_MAX_BYTES: int = 100 * 1024 * 1024  # per file; 0 disables the limit
+    UPLOAD_CHUNK_SIZE: int = 1024 * 1024  # bytes read and written at a time while saving uploads
+    MAX_LOADED_COLLECTIONS: int = 8  # collections kept in memory; others are reloaded from disk
+    PERSIST_VECTOR_STORE: bool = True
+    VECTOR_STORE_MMAP: bool = False
+    SNAPSHOT_RETENTION_SECONDS: float = 300  # superseded snapshots are kept this long for workers still loading them
+    SNAPSHOT_MAX_RETAINED: int = 1  # superseded snapshots kept at most, however recent
+    SNAPSHOT_COMPACT_RATIO: float = 0.5  # write a new snapshot once its change journal reaches this share of its size
+    VECTOR_INDEX_TYPE: str = "flat"  # flat | hnsw | ivf
+    VECTOR_INDEX_QUANTIZATION: str = "none"  # none | fp16 | sq8 (int8) | pq
+    VECTOR_INDEX_RESCORE: int = 4  # compressed indexes: re-rank this many times k hits by exact distance; 0 disables; the float32 copies it keeps cancel the memory quantization saves unless PERSIST_VECTOR_STORE maps them from disk
+    VECTOR_INDEX_TRAIN_MIN: int = 0  # vectors needed before training; 0 picks a default per index
+    VECTOR_INDEX_HNSW_M: int = 32
+    VECTOR_INDEX_HNSW_EF_CONSTRUCTION: int = 80
+    VECTOR_INDEX_HNSW_EF_SEARCH: int = 64
+    VECTOR_INDEX_IVF_NLIST: int = 1024
+    VECTOR_INDEX_IVF_NPROBE: int = 16
+    VECTOR_INDEX_PQ_M: int = 64  # sub-quantizers; must divide the embedding dimension
+    EMBEDDING_MODEL: str = "thenlper/gte-large"
+    EMBEDDING_BATCH_SIZE: int = 32
+    EMBEDDING_THREADS: int = 0  # 0 keeps torch's default
+    EMBEDDING_CACHE_PATH: str = str(Path(__file__).parent.parent.parent / "cache" / "embeddings.sqlite3")  # empty disables
+    EMBEDDING_CACHE_MAX_ENTRIES: int = 100000  # least recently used vectors are evicted beyond this; 0 keeps all
     CHUNK_SIZE: int = 800
     CHUNK_OVERLAP: int = 200
+    INGEST_WORKERS: int = 2
+    INGEST_PARSE_PROCESSES: int = 0  # 0 uses one per CPU core
+    INGEST_PAGES_PER_SHARD: int = 8  # pages parsed per process-pool task
+    PDF_TABLES_REQUIRE_RULINGS: bool = True  # only look for tables on pages that draw lines
+    INGEST_MAX_JOBS: int = 100
+    EXPORT_STRUCTURED_JSON: bool = False
+    RETRIEVAL_K: int = 3
+    QUERY_BATCHING: bool = True  # embed and search concurrent chat queries together
+    QUERY_BATCH_MAX: int = 32
+    QUERY_BATCH_WINDOW_MS: float = 5.0  # wait for more queries, only while under concurrent load
+    HYBRID_SEARCH: bool = True  # fuse BM25 with FAISS results
+    RETRIEVAL_CANDIDATES: int = 20  # hits taken from each retriever before fusion
+    RRF_K: int = 60
+    RERANK_MODEL: str = ""  # e.g. cross-encoder/ms-marco-MiniLM-L-6-v2; empty disables
+    RERANK_CANDIDATES: int = 10
+    RERANK_BUDGET_MS: float = 200.0
+    RERANK_BATCH_SIZE: int = 8
+    CONTEXT_TOKEN_BUDGET: int = 1500
+    CONTEXT_TOKENIZER: str = ""  # Hugging Face tokenizer matching the Ollama model; empty estimates 4 chars/token
+    CONTEXT_DEDUP_THRESHOLD: float = 0.8  # shingle Jaccard similarity above which a section is dropped
+    ANSWER_CACHE_ENABLED: bool = True
+    ANSWER_CACHE_THRESHOLD: float = 0.95  # cosine similarity
+    ANSWER_CACHE_TTL: float = 3600.0
+    ANSWER_CACHE_MAX_ENTRIES: int = 1000
+    OLLAMA_BASE_URL: str = "http://localhost:11434"
+    OLLAMA_BASE_URLS: str = ""  # comma-separated endpoints to spread generations over; empty uses OLLAMA_BASE_URL
+    OLLAMA_MANAGE_SERVER: bool = True  # start and stop `ollama serve` with the app
+    OLLAMA_MODEL: str = "llama3.2-vision"
+    OLLAMA_MAX_CONCURRENCY: int = 4  # per endpoint
+    OLLAMA_MAX_QUEUE: int = 32  # generations waiting for a slot before new ones get 429
+    OLLAMA_QUEUE_TIMEOUT: float = 60.0  # seconds a generation may wait for a slot
+    OLLAMA_TIMEOUT: float = 300.0
+    OLLAMA_CONNECT_TIMEOUT: float = 5.0
+    OLLAMA_HEALTH_INTERVAL: float = 5.0
 
 settings = Settings()
\ No newline at end of file
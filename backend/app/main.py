@@ -1,10 +1,16 @@
 import os
 import shutil
-from fastapi import FastAPI
+from fastapi import FastAPI, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse
+from core.config import settings
 from routers import upload, chat
+from services.ingest_jobs import ingest_jobs
+from services.llm_scheduler import llm_scheduler
 from services.ollama_service import start_ollama_server, stop_ollama_server
+from services.warmup import warm_up
 from dotenv import load_dotenv
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 load_dotenv()
 
 app = FastAPI(
@@ -24,15 +30,55 @@ app.add_middleware(
 
 @app.on_event("startup")
 async def startup_event():
-    """Start the Ollama server on application startup."""
-    start_ollama_server()
+    """Start the Ollama server and its clients on application startup.
+
+    Models are loaded by a background warm-up, so startup does not wait
+    for them.
+    """
+    if settings.OLLAMA_MANAGE_SERVER:
+        start_ollama_server()
+    await llm_scheduler.start()
+    if settings.WARMUP_ON_STARTUP:
+        warm_up.start()
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """Stop the Ollama server on application shutdown."""
+    await warm_up.stop()
+    await llm_scheduler.close()
     stop_ollama_server()
-    if os.path.exists(upload.FILES_DIR):
-        shutil.rmtree(upload.FILES_DIR)
+    ingest_jobs.shutdown()
+    # Uploaded files are kept alongside a persisted vector store
+    if not settings.PERSIST_VECTOR_STORE and os.path.exists(settings.FILES_DIR):
+        shutil.rmtree(settings.FILES_DIR)
+
+@app.get("/health")
+async def health():
+    """Liveness: the process is up and serving requests."""
+    return {"status": "ok"}
+
+@app.get("/ready")
+async def ready():
+    """Readiness: models and the default collection are loaded and an Ollama endpoint is reachable."""
+    models_ready = warm_up.done or not settings.WARMUP_ON_STARTUP
+    is_ready = models_ready and llm_scheduler.healthy
+    return JSONResponse(
+        {
+            "status": "ready" if is_ready else "not_ready",
+            "warm_up": {"done": models_ready, "loaded": warm_up.loaded, "error": warm_up.error},
+            "ollama": {
+                "healthy": llm_scheduler.healthy,
+                "endpoints": llm_scheduler.status(),
+                "queued": llm_scheduler.queued,
+            },
+        },
+        status_code=200 if is_ready else 503,
+    )
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics, including the per-stage latency histograms."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 # Include routers
 app.include_router(upload.router, prefix="/upload", tags=["Upload"])
@@ -1,51 +1,212 @@
-import os
-from fastapi import APIRouter, HTTPException
+import asyncio
+import json
+import logging
+import math
+import time
+from typing import List, Literal, Tuple
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+from langchain.schema import Document
 from pydantic import BaseModel
-from services.document_processor import document_processor
-from utils.generate_response import generate_response
+from core.config import settings
+from services.answer_cache import answer_cache
+from services.collection_manager import DEFAULT_COLLECTION, get_collection
+from services.llm_scheduler import PRIORITY_BATCH, PRIORITY_INTERACTIVE, llm_scheduler
+from services.metrics import ANSWER_CACHE_REQUESTS, observe, timed
+from services.query_batcher import query_batcher
+from utils.context_builder import build_context as assemble_context
+from utils.generate_response import describe_error, generate_answer, stream_response
+from utils.ollama_errors import OllamaBusyError, OllamaConnectionError
 
 router = APIRouter()
 
 class ChatRequest(BaseModel):
     query: str
+    # Batch requests (scripts, evaluations) wait behind interactive ones for the model
+    priority: Literal["interactive", "batch"] = "interactive"
+
+    @property
+    def llm_priority(self) -> int:
+        return PRIORITY_BATCH if self.priority == "batch" else PRIORITY_INTERACTIVE
 
 # document_store = []
 # embeddings_store = None
 
-FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "files")
-os.makedirs(FILES_DIR, exist_ok=True)
+NO_RESULTS = "No relevant information found in the uploaded documents."
+
+# How often a waiting /chat request checks whether its client is still there
+DISCONNECT_POLL_SECONDS = 0.25
+
+
+async def retrieve(query: str, collection: str,
+                   k: int = settings.RETRIEVAL_K) -> Tuple[np.ndarray, List[Tuple[str, Document, float]], int]:
+    """Embed the query and get the collection's top chunks from FAISS and BM25.
+
+    Returns the query embedding, the (docstore id, document, score) hits
+    and the store version they were read from. With QUERY_BATCHING on,
+    concurrent queries are embedded and searched together.
+    """
+    document_processor = await run_in_threadpool(get_collection, collection)
+    version = document_processor.version
+    if settings.QUERY_BATCHING:
+        embedding, hits = await asyncio.wrap_future(query_batcher.submit(document_processor, query, k))
+    else:
+        embedding = await run_in_threadpool(document_processor.embed_query, query)
+        hits = await run_in_threadpool(document_processor.hybrid_search, query, k, embedding)
+    return embedding, hits, version
+
+
+def build_context(chunks) -> str:
+    """Combine the retrieved chunks into a single Markdown context within the token budget."""
+    with timed("context_build"):
+        markdown_content = assemble_context([doc for _, doc, _ in chunks]).markdown
+
+    logging.debug("Markdown Content passed to Ollama: %s", markdown_content[:200])
+    return markdown_content
+
+
+def cached_answer(collection: str, embedding, chunks, version):
+    if not settings.ANSWER_CACHE_ENABLED:
+        return None
+    answer = answer_cache.get(collection, version, embedding, [doc_id for doc_id, _, _ in chunks])
+    ANSWER_CACHE_REQUESTS.labels("miss" if answer is None else "hit").inc()
+    return answer
+
+
+def cache_answer(collection: str, embedding, chunks, version, answer: str) -> None:
+    if settings.ANSWER_CACHE_ENABLED:
+        answer_cache.put(collection, version, embedding, [doc_id for doc_id, _, _ in chunks], answer)
+
+
+def scheduler_error(e: Exception) -> HTTPException:
+    """429 when the model is saturated, 503 when no Ollama endpoint is reachable."""
+    if isinstance(e, OllamaBusyError):
+        return HTTPException(status_code=429, detail=str(e),
+                             headers={"Retry-After": str(e.retry_after), "X-Queue-Length": str(e.queued)})
+    return HTTPException(status_code=503, detail=describe_error(e),
+                         headers={"Retry-After": str(math.ceil(settings.OLLAMA_HEALTH_INTERVAL))})
+
+
+async def until_disconnected(http_request: Request, coro):
+    """Await coro, cancelling it if the client disconnects first."""
+    task = asyncio.ensure_future(coro)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=DISCONNECT_POLL_SECONDS)
+            if done:
+                return task.result()
+            if await http_request.is_disconnected():
+                logging.info("Client disconnected; cancelling its generation")
+                raise HTTPException(status_code=499, detail="Client closed the request.")
+    finally:
+        task.cancel()
+
 
 @router.post("/")
-async def chat(request: ChatRequest):
-    """Endpoint to ask a question based on uploaded documents."""
+async def chat(request: ChatRequest, http_request: Request, collection: str = DEFAULT_COLLECTION):
+    """Endpoint to ask a question based on the documents of a collection.
+
+    Returns 429 with Retry-After when the model's queue is full, and 503
+    when Ollama is unreachable.
+    """
+    with timed("chat"):
+        return await _chat(request, http_request, collection)
+
+
+async def _chat(request: ChatRequest, http_request: Request, collection: str):
     try:
-        # Get relevant document chunks from FAISS
-        top_chunks = document_processor.query_documents(request.query, k=3)
+        embedding, chunks, version = await retrieve(request.query, collection)
+        if not chunks:
+            return {"response": NO_RESULTS}
 
-        if not top_chunks:
-            return {"response": "No relevant information found in the uploaded documents."}
-        
-        # Combine the chunks into a single context
-        markdown_content = "# Relevant Document Sections\n\n"
-        for i, chunk in enumerate(top_chunks):
-            markdown_content += f"## Section {i + 1}\n\n{chunk}\n\n"
-        
-        print(f"Markdown Content passed to Ollama: {markdown_content[:200]}")  # Debugging log
+        answer = cached_answer(collection, embedding, chunks, version)
+        if answer is not None:
+            return {"response": answer, "cached": True}
         
         # Generate response based on the retrieved content
-        response = generate_response(query=request.query, markdown_content=markdown_content)
-        return {"response": response}
+        try:
+            answer = await until_disconnected(http_request, generate_answer(
+                query=request.query, markdown_content=build_context(chunks), priority=request.llm_priority))
+        except (OllamaBusyError, OllamaConnectionError) as e:
+            raise scheduler_error(e)
+        except HTTPException:
+            raise
+        except Exception as e:
+            return {"response": f"Error: {describe_error(e)}"}
+        cache_answer(collection, embedding, chunks, version, answer)
+        return {"response": answer}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
+
+
+def _sse(payload: dict) -> str:
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+@router.post("/stream")
+async def chat_stream(request: ChatRequest, collection: str = DEFAULT_COLLECTION):
+    """Like /chat, but stream the answer as server-sent events.
+
+    Each event carries {"token": ...}; the stream ends with {"done": true},
+    or {"error": ...} if generation fails. Like /chat, answers 429 or 503
+    up front when the model cannot take the request; the generation is
+    cancelled if the client disconnects.
+    """
+    started = time.perf_counter()
+    try:
+        embedding, chunks, version = await retrieve(request.query, collection)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=str(e))
+
+    answer = cached_answer(collection, embedding, chunks, version) if chunks else None
+    if chunks and answer is None:
+        try:
+            llm_scheduler.check_admission()
+        except (OllamaBusyError, OllamaConnectionError) as e:
+            raise scheduler_error(e)
+
+    async def events():
+        try:
+            if not chunks:
+                yield _sse({"token": NO_RESULTS})
+            elif answer is not None:
+                yield _sse({"token": answer, "cached": True})
+            else:
+                tokens = []
+                try:
+                    async for token in stream_response(request.query, build_context(chunks),
+                                                       priority=request.llm_priority):
+                        tokens.append(token)
+                        yield _sse({"token": token})
+                except Exception as e:
+                    yield _sse({"error": describe_error(e)})
+                    return
+                cache_answer(collection, embedding, chunks, version, "".join(tokens))
+            yield _sse({"done": True})
+        finally:
+            observe("chat_stream", time.perf_counter() - started)
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
     
 @router.get("/status")
-async def faiss_status():
-    """Check the status of the FAISS vector store."""
+async def faiss_status(collection: str = DEFAULT_COLLECTION):
+    """Check the status of a collection's FAISS vector store."""
     try:
-        if document_processor.vector_store:
+        document_processor = await run_in_threadpool(get_collection, collection)
+        if document_processor.vector_store is not None:
             try:
                 # Get document count if possible
-                doc_count = len(document_processor.vector_store.index_to_docstore_id)
+                doc_count = len(document_processor.vector_store)
                 return {
                     "status": "initialized",
                     "document_count": doc_count
@@ -57,5 +218,7 @@ async def faiss_status():
                 }
         else:
             return {"status": "not_initialized"}
+    except HTTPException:
+        raise
     except Exception as e:
         return {"status": "error", "message": str(e)}
@@ -2,65 +2,101 @@ import logging
 import os
 from typing import List
 from fastapi import APIRouter, UploadFile, File, HTTPException
-from utils.file_utils import process_pdf_to_markdown, save_file
-from services.document_processor import document_processor
+from fastapi.concurrency import run_in_threadpool
+from utils.file_utils import check_upload_size, save_file
+from services.collection_manager import (
+    DEFAULT_COLLECTION, collection_files_dir, collection_manager, get_collection, validate_collection,
+)
+from services.ingest_jobs import ingest_jobs
 
 router = APIRouter()
 
-FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "files")  # Save files inside app/files
-os.makedirs(FILES_DIR, exist_ok=True)
 
+@router.post("/", status_code=202)
+async def upload_files(file: List[UploadFile] = File(...), collection: str = DEFAULT_COLLECTION):
+    """Endpoint to upload files into a collection, which is created if needed.
 
-@router.post("/")
-async def upload_files(file: List[UploadFile] = File(...)):
-    """Endpoint to upload a file."""
+    Files are streamed to disk, hashed on the way, and queued for parsing and
+    embedding in the background; poll /upload/jobs/{job_id} for progress.
+    Files whose content is already indexed are skipped without parsing.
+    """
     try:
-        results = []
-        # Save the uploaded PDF file
-        file_paths = [save_file(f) for f in file]
+        validate_collection(collection)
+        files_dir = collection_files_dir(collection)
+        # Reject oversized files before saving any of them
+        for f in file:
+            check_upload_size(f)
 
-        # Process the document using the DocumentProcessor (FAISS)
-        for f, file_path in zip(file, file_paths):
-            document_processor.process_document(file_path)
-            logging.info(f"Processed file: {file_path}")
-            markdown_content = process_pdf_to_markdown(file_path)
+        # Save the uploaded PDF files. If one fails, the ones saved before it
+        # may have replaced earlier versions, so they are still queued
+        saved = []
+        for f in file:
+            try:
+                saved.append(await run_in_threadpool(save_file, f, files_dir))
+            except HTTPException as e:
+                if saved:
+                    job = ingest_jobs.submit([path for path, _ in saved], collection,
+                                             digests=[digest for _, digest in saved])
+                    names = ", ".join(os.path.basename(path) for path, _ in saved)
+                    e.detail = f"{e.detail}; files saved before it were queued as job {job.id}: {names}"
+                raise
+        file_paths = [path for path, _ in saved]
 
-        # Save the Markdown file in the same folder as the PDF
-            filename = f.filename or "uploaded_file"
-            markdown_file_path = os.path.join(FILES_DIR, f"{os.path.splitext(filename)[0]}.md")
-            with open(markdown_file_path, "w", encoding="utf-8") as md_file:
-                md_file.write(markdown_content)
-        
-            # json_path = os.path.join(FILES_DIR, f"{os.path.splitext(filename)[0]}.json")
-            # pdf_to_structured_json(file_path, output_path=json_path)
-
-            results.append({
-                "filename": f.filename,
-                "pdf_file": file_path,
-                "markdown_file": markdown_file_path,
-            })
-
-        return {"message": f"Processed {len(results)} files successfully", "files": results}
+        job = ingest_jobs.submit(file_paths, collection, digests=[digest for _, digest in saved])
+        return {
+            "message": f"Queued {len(file_paths)} files for processing",
+            "job_id": job.id,
+            "collection": collection,
+            "files": [os.path.basename(path) for path in file_paths],
+        }
     
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
+        if isinstance(e, HTTPException):
+            raise e
         raise HTTPException(status_code=500, detail=f"Error uploading file: {str(e)}")
+
+@router.get("/jobs/{job_id}")
+async def upload_job_status(job_id: str):
+    """Return the stage and progress of each file in an upload job."""
+    job = ingest_jobs.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job.to_dict()
     
+@router.get("/collections")
+async def list_collections():
+    """Return the known collections and those currently loaded in memory."""
+    return {"collections": collection_manager.names(), "loaded": collection_manager.loaded()}
+
 @router.get("/status")
-async def upload_status():
-    """Return the list of uploaded PDF files."""
+async def upload_status(collection: str = DEFAULT_COLLECTION):
+    """Return the list of PDF files uploaded to a collection."""
     try:
-        # Get all PDF files in the FILES_DIR
-        pdf_files = [f for f in os.listdir(FILES_DIR) if f.endswith(".pdf")]
-        return {"files": pdf_files}
+        validate_collection(collection)
+        if not collection_manager.exists(collection):
+            raise HTTPException(status_code=404, detail=f"Collection {collection} not found")
+        # Get all PDF files in the collection's files directory
+        files_dir = collection_files_dir(collection)
+        pdf_files = [f for f in os.listdir(files_dir) if f.endswith(".pdf")] if os.path.isdir(files_dir) else []
+        return {"collection": collection, "files": pdf_files}
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error getting file status: {str(e)}")
 
 @router.delete("/{filename}")
-async def delete_file(filename: str):
-    """Delete a file and rebuild the FAISS index."""
+async def delete_file(filename: str, collection: str = DEFAULT_COLLECTION):
+    """Delete a file and remove its chunks from the collection's FAISS index."""
     try:
+        document_processor = await run_in_threadpool(get_collection, collection)
+        files_dir = collection_files_dir(collection)
+
         # Create the full file path
-        file_path = os.path.join(FILES_DIR, filename)
+        file_path = os.path.join(files_dir, os.path.basename(filename))
         
         # Check if file exists
         if not os.path.exists(file_path):
@@ -72,20 +108,16 @@ async def delete_file(filename: str):
         # Also delete any associated files (markdown, json)
         base_name = os.path.splitext(filename)[0]
         for ext in [".md", ".json"]:
-            associated_file = os.path.join(FILES_DIR, f"{base_name}{ext}")
+            associated_file = os.path.join(files_dir, f"{base_name}{ext}")
             if os.path.exists(associated_file):
                 os.remove(associated_file)
         
-        # Rebuild the FAISS index
-        document_processor.vector_store = None  # Reset the vector store
-        pdf_files = [f for f in os.listdir(FILES_DIR) if f.endswith(".pdf")]
-        for pdf_file in pdf_files:
-            file_path = os.path.join(FILES_DIR, pdf_file)
-            document_processor.process_document(file_path)
+        # Drop only this file's chunks from the FAISS index
+        removed = await run_in_threadpool(document_processor.delete_document, filename)
         
-        print(f"File {filename} deleted and FAISS index rebuilt successfully")
+        logging.info(f"File {filename} deleted and {removed} chunks removed from the FAISS index")
         
-        return {"message": f"File {filename} deleted successfully and FAISS index rebuilt"}
+        return {"message": f"File {filename} deleted successfully and removed from the FAISS index", "chunks_removed": removed}
     except Exception as e:
         if isinstance(e, HTTPException):
             raise e
@@ -0,0 +1,111 @@
+import itertools
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, FrozenSet, Optional, Sequence, Set, Tuple
+
+import numpy as np
+
+from core.config import settings
+
+
+class _Entry:
+    def __init__(self, key: Tuple[str, FrozenSet[str]], embedding: np.ndarray, answer: str):
+        self.key = key
+        self.embedding = embedding
+        self.answer = answer
+        self.created_at = time.monotonic()
+
+
+class AnswerCache:
+    """Semantic cache of chat answers.
+
+    A stored answer is reused when a new query's embedding is within the
+    cosine threshold of a cached query *and* retrieval returned the same set
+    of chunk ids, so the model would have seen the same context. Entries
+    expire after a TTL, the least recently used are evicted beyond
+    max_entries, and a scope is cleared whenever its store version changes.
+    """
+
+    def __init__(self, max_entries: int = settings.ANSWER_CACHE_MAX_ENTRIES,
+                 ttl: float = settings.ANSWER_CACHE_TTL,
+                 threshold: float = settings.ANSWER_CACHE_THRESHOLD):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[int, _Entry]" = OrderedDict()
+        self._by_key: Dict[Tuple[str, FrozenSet[str]], Set[int]] = {}
+        self._versions: Dict[str, int] = {}
+        self._ids = itertools.count()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _unit(embedding) -> np.ndarray:
+        vector = np.asarray(embedding, dtype=np.float32).ravel()
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def _remove(self, entry_id: int) -> None:
+        entry = self._entries.pop(entry_id)
+        ids = self._by_key[entry.key]
+        ids.discard(entry_id)
+        if not ids:
+            del self._by_key[entry.key]
+
+    def _check_version(self, scope: str, version: int) -> bool:
+        """Drop a scope's entries once its documents have changed.
+
+        Returns False for a request made against an older version.
+        """
+        current = self._versions.get(scope)
+        if current is not None and version < current:
+            return False
+        if current != version:
+            self._versions[scope] = version
+            for entry_id in [i for i, e in self._entries.items() if e.key[0] == scope]:
+                self._remove(entry_id)
+        return True
+
+    def get(self, scope: str, version: int, embedding, chunk_ids: Sequence[str]) -> Optional[str]:
+        """Return a cached answer for a similar query over the same chunks."""
+        key = (scope, frozenset(chunk_ids))
+        query = self._unit(embedding)
+        now = time.monotonic()
+        with self._lock:
+            if not self._check_version(scope, version):
+                return None
+            best_id, best_score = None, self.threshold
+            for entry_id in list(self._by_key.get(key, ())):
+                entry = self._entries[entry_id]
+                if now - entry.created_at > self.ttl:
+                    self._remove(entry_id)
+                    continue
+                score = float(np.dot(query, entry.embedding))
+                if score >= best_score:
+                    best_id, best_score = entry_id, score
+            if best_id is None:
+                return None
+            self._entries.move_to_end(best_id)
+            return self._entries[best_id].answer
+
+    def put(self, scope: str, version: int, embedding, chunk_ids: Sequence[str], answer: str) -> None:
+        key = (scope, frozenset(chunk_ids))
+        with self._lock:
+            if not self._check_version(scope, version):
+                return
+            entry_id = next(self._ids)
+            self._entries[entry_id] = _Entry(key, self._unit(embedding), answer)
+            self._by_key.setdefault(key, set()).add(entry_id)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._by_key.clear()
+
+
+answer_cache = AnswerCache()
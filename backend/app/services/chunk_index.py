@@ -0,0 +1,158 @@
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+# Chunk digests are hex SHA-256 strings, kept as their 32 raw bytes
+DIGEST_BYTES = 32
+DIGEST_DTYPE = np.dtype(f"V{DIGEST_BYTES}")
+# Docstore ids are uuid4 strings
+ID_DTYPE = np.dtype("S36")
+
+
+def pack_digests(digests: Iterable[str]) -> bytes:
+    """Concatenate the raw bytes of hex digests."""
+    return b"".join(bytes.fromhex(digest) for digest in digests)
+
+
+def unpack_digests(packed: bytes) -> List[str]:
+    return [packed[i:i + DIGEST_BYTES].hex() for i in range(0, len(packed), DIGEST_BYTES)]
+
+
+class ChunkIndex:
+    """Chunk digest -> docstore id, and the number of files referencing each chunk.
+
+    Entries are kept in fixed-width arrays sorted by raw digest and found by
+    bisection, so a chunk costs 72 bytes rather than two dict entries and
+    their strings. Entries added since the last merge wait in a small dict,
+    and deleted ones are only marked; both are folded into the arrays once
+    they make up MERGE_RATIO of them.
+    """
+
+    MERGE_RATIO = 0.125
+    MIN_MERGE = 1024
+
+    def __init__(self):
+        self._digests = np.zeros(0, dtype=DIGEST_DTYPE)
+        self._ids = np.zeros(0, dtype=ID_DTYPE)
+        self._refs = np.zeros(0, dtype=np.int32)
+        self._live = np.zeros(0, dtype=bool)
+        self._deleted = 0
+        # raw digest -> [docstore id, refs] for entries not merged yet
+        self._recent: Dict[bytes, list] = {}
+
+    @classmethod
+    def from_maps(cls, chunk_index: Dict[str, str], chunk_refs: Dict[str, int]) -> "ChunkIndex":
+        """Build an index from digest -> docstore id and digest -> refs dicts."""
+        index = cls()
+        index._recent = {bytes.fromhex(digest): [doc_id, chunk_refs.get(digest, 0)]
+                         for digest, doc_id in chunk_index.items()}
+        index._merge()
+        return index
+
+    def __len__(self) -> int:
+        return len(self._digests) - self._deleted + len(self._recent)
+
+    def __contains__(self, digest: str) -> bool:
+        key = bytes.fromhex(digest)
+        return key in self._recent or self._row(key) >= 0
+
+    def _row(self, key: bytes) -> int:
+        """Row of a live merged entry, or -1."""
+        row = int(np.searchsorted(self._digests, np.frombuffer(key, dtype=DIGEST_DTYPE)[0]))
+        if row < len(self._digests) and self._live[row] and self._digests[row].tobytes() == key:
+            return row
+        return -1
+
+    def get(self, digest: str) -> Optional[str]:
+        """Docstore id of a chunk, or None if it is not indexed."""
+        key = bytes.fromhex(digest)
+        entry = self._recent.get(key)
+        if entry is not None:
+            return entry[0]
+        row = self._row(key)
+        return self._ids[row].decode("ascii") if row >= 0 else None
+
+    def add(self, digest: str, doc_id: str) -> None:
+        """Index a new chunk with no references yet."""
+        self._recent[bytes.fromhex(digest)] = [doc_id, 0]
+        if len(self._recent) > max(self.MIN_MERGE, self.MERGE_RATIO * len(self._digests)):
+            self._merge()
+
+    def pop(self, digest: str) -> Optional[str]:
+        """Remove a chunk and return its docstore id, or None if it is not indexed."""
+        key = bytes.fromhex(digest)
+        entry = self._recent.pop(key, None)
+        if entry is not None:
+            return entry[0]
+        row = self._row(key)
+        if row < 0:
+            return None
+        doc_id = self._ids[row].decode("ascii")
+        self._live[row] = False
+        self._deleted += 1
+        if self._deleted > max(self.MIN_MERGE, self.MERGE_RATIO * len(self._digests)):
+            self._merge()
+        return doc_id
+
+    def refs(self, digest: str) -> int:
+        key = bytes.fromhex(digest)
+        entry = self._recent.get(key)
+        if entry is not None:
+            return entry[1]
+        row = self._row(key)
+        return int(self._refs[row]) if row >= 0 else 0
+
+    def add_ref(self, digest: str) -> None:
+        """Count one more file referencing an indexed chunk."""
+        key = bytes.fromhex(digest)
+        entry = self._recent.get(key)
+        if entry is not None:
+            entry[1] += 1
+            return
+        row = self._row(key)
+        if row < 0:
+            raise KeyError(digest)
+        self._refs[row] += 1
+
+    def release(self, digest: str) -> int:
+        """Count one file fewer referencing a chunk and return how many remain."""
+        key = bytes.fromhex(digest)
+        entry = self._recent.get(key)
+        if entry is not None:
+            entry[1] = max(entry[1] - 1, 0)
+            return entry[1]
+        row = self._row(key)
+        if row < 0:
+            return 0
+        self._refs[row] = max(int(self._refs[row]) - 1, 0)
+        return int(self._refs[row])
+
+    def _merged(self):
+        """Sorted digest, id and refs arrays holding every live entry."""
+        live = self._live
+        recent = np.frombuffer(b"".join(self._recent), dtype=DIGEST_DTYPE)
+        digests = np.concatenate((self._digests[live], recent))
+        ids = np.concatenate((self._ids[live], np.array([entry[0] for entry in self._recent.values()],
+                                                        dtype=ID_DTYPE)))
+        refs = np.concatenate((self._refs[live], np.array([entry[1] for entry in self._recent.values()],
+                                                          dtype=np.int32)))
+        order = np.argsort(digests, kind="stable")
+        return digests[order], ids[order], refs[order]
+
+    def _merge(self) -> None:
+        self._digests, self._ids, self._refs = self._merged()
+        self._live = np.ones(len(self._digests), dtype=bool)
+        self._deleted = 0
+        self._recent = {}
+
+    def __getstate__(self) -> dict:
+        # Saved while queries may be reading, so the index itself is left as is
+        digests, ids, refs = self._merged()
+        return {"digests": digests.tobytes(), "ids": ids, "refs": refs}
+
+    def __setstate__(self, state: dict) -> None:
+        self.__init__()
+        self._digests = np.frombuffer(state["digests"], dtype=DIGEST_DTYPE).copy()
+        self._ids = state["ids"]
+        self._refs = state["refs"]
+        self._live = np.ones(len(self._digests), dtype=bool)
@@ -0,0 +1,193 @@
+from collections.abc import Mapping
+from typing import Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+from langchain.schema import Document
+
+# Stands for a missing source, page or start index in the integer columns
+MISSING = -1
+
+
+class ChunkStore(Mapping):
+    """Chunk texts and metadata in flat arrays, keyed by docstore id.
+
+    Texts are UTF-8 encoded into one shared buffer and located by offset and
+    length. Source file names are interned, and the source, page and start
+    index of each chunk are kept in integer columns; any other metadata is
+    kept in a dict for the few chunks that have it. Each chunk occupies the
+    row given when it is added (the vector store uses its FAISS label), so a
+    chunk costs one id entry instead of a Document and its metadata dict.
+    Documents are built on access.
+    """
+
+    # Compact the text buffer once this share of it belongs to deleted chunks
+    MAX_GARBAGE_RATIO = 0.5
+
+    def __init__(self):
+        self.rows: Dict[str, int] = {}
+        # row -> docstore id, None for rows that were deleted or never used
+        self.ids: List[Optional[str]] = []
+        self._text = bytearray()
+        self._garbage = 0
+        self._offsets = np.zeros(0, dtype=np.int64)
+        self._lengths = np.zeros(0, dtype=np.int32)
+        self._sources = np.zeros(0, dtype=np.int32)
+        self._pages = np.zeros(0, dtype=np.int32)
+        self._starts = np.zeros(0, dtype=np.int64)
+        self._source_names: List[str] = []
+        self._source_index: Dict[str, int] = {}
+        self._extra: Dict[int, dict] = {}
+
+    @classmethod
+    def from_documents(cls, rows: Dict[str, int], documents: Dict[str, Document]) -> "ChunkStore":
+        """Build a store from a docstore dict and the row of each id."""
+        store = cls()
+        ids = sorted(documents, key=rows.__getitem__)
+        store.add(ids, [rows[doc_id] for doc_id in ids], [documents[doc_id] for doc_id in ids])
+        return store
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.rows)
+
+    def __contains__(self, doc_id) -> bool:
+        return doc_id in self.rows
+
+    def __getitem__(self, doc_id: str) -> Document:
+        return self.document(self.rows[doc_id])
+
+    def id_at(self, row: int) -> Optional[str]:
+        """Docstore id stored in a row, or None."""
+        return self.ids[row] if 0 <= row < len(self.ids) else None
+
+    def text(self, row: int) -> str:
+        offset = int(self._offsets[row])
+        return self._text[offset:offset + int(self._lengths[row])].decode("utf-8")
+
+    def document(self, row: int) -> Document:
+        metadata = {}
+        if self._sources[row] != MISSING:
+            metadata["source"] = self._source_names[self._sources[row]]
+        if self._pages[row] != MISSING:
+            metadata["page"] = int(self._pages[row])
+        if self._starts[row] != MISSING:
+            metadata["start_index"] = int(self._starts[row])
+        metadata.update(self._extra.get(row, ()))
+        return Document(page_content=self.text(row), metadata=metadata)
+
+    def _grow(self, size: int) -> None:
+        capacity = len(self._offsets)
+        if size <= capacity:
+            return
+        capacity = max(size, 2 * capacity, 1024)
+        for name in ("_offsets", "_lengths", "_sources", "_pages", "_starts"):
+            column = getattr(self, name)
+            grown = np.full(capacity, MISSING, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+
+    def _source(self, source: str) -> int:
+        index = self._source_index.get(source)
+        if index is None:
+            index = self._source_index[source] = len(self._source_names)
+            self._source_names.append(source)
+        return index
+
+    def add(self, ids: Sequence[str], rows: Sequence[int], documents: Sequence[Document]) -> None:
+        """Store documents in the given rows, which must not be in use."""
+        size = max(rows, default=-1) + 1
+        self._grow(size)
+        if len(self.ids) < size:
+            self.ids.extend([None] * (size - len(self.ids)))
+        for doc_id, row, document in zip(ids, rows, documents):
+            encoded = document.page_content.encode("utf-8")
+            self._offsets[row] = len(self._text)
+            self._lengths[row] = len(encoded)
+            self._text += encoded
+
+            extra = {}
+            for key, value in document.metadata.items():
+                if key == "source" and isinstance(value, str):
+                    self._sources[row] = self._source(value)
+                elif key in ("page", "start_index") and type(value) is int and value >= 0:
+                    (self._pages if key == "page" else self._starts)[row] = value
+                else:
+                    extra[key] = value
+            if extra:
+                self._extra[row] = extra
+            self.rows[doc_id] = row
+            self.ids[row] = doc_id
+
+    def delete(self, doc_id: str) -> Optional[int]:
+        """Remove a chunk and return the row it occupied, or None if unknown."""
+        row = self.rows.pop(doc_id, None)
+        if row is None:
+            return None
+        self.ids[row] = None
+        self._garbage += int(self._lengths[row])
+        for column in (self._sources, self._pages, self._starts):
+            column[row] = MISSING
+        self._extra.pop(row, None)
+        if self._garbage > self.MAX_GARBAGE_RATIO * len(self._text):
+            self._compact()
+        return row
+
+    def take(self, rows: Sequence[int]) -> "ChunkStore":
+        """Return a new store holding the given rows of this one, renumbered from 0."""
+        rows = np.asarray(rows, dtype=np.int64)
+        store = type(self)()
+        store._grow(len(rows))
+        lengths = self._lengths[rows]
+        with memoryview(self._text) as view:
+            store._text = bytearray(b"".join(
+                view[offset:offset + length] for offset, length in zip(self._offsets[rows].tolist(), lengths.tolist())
+            ))
+        store._offsets[:len(rows)] = np.cumsum(lengths, dtype=np.int64) - lengths
+        store._lengths[:len(rows)] = lengths
+        for name in ("_sources", "_pages", "_starts"):
+            getattr(store, name)[:len(rows)] = getattr(self, name)[rows]
+        store._source_names = list(self._source_names)
+        store._source_index = dict(self._source_index)
+        store._extra = {new: self._extra[old] for new, old in enumerate(rows.tolist()) if old in self._extra}
+        store.ids = [self.ids[row] for row in rows.tolist()]
+        store.rows = {doc_id: row for row, doc_id in enumerate(store.ids)}
+        return store
+
+    def _packed(self):
+        """Return the text buffer without the texts of deleted chunks, and offsets into it."""
+        text = bytearray()
+        offsets = self._offsets.copy()
+        for row in sorted(self.rows.values()):
+            offset, length = int(self._offsets[row]), int(self._lengths[row])
+            offsets[row] = len(text)
+            text += self._text[offset:offset + length]
+        return text, offsets
+
+    def _compact(self) -> None:
+        self._text, self._offsets = self._packed()
+        self._garbage = 0
+
+    @property
+    def nbytes(self) -> int:
+        """Bytes held by the text buffer and the metadata columns."""
+        return len(self._text) + sum(column.nbytes for column in (
+            self._offsets, self._lengths, self._sources, self._pages, self._starts))
+
+    def __getstate__(self) -> dict:
+        # Saved while queries may be reading, so the store itself is left as is
+        state = dict(self.__dict__)
+        text, state["_offsets"] = self._packed() if self._garbage else (self._text, self._offsets)
+        state["_text"] = bytes(text)
+        state["_garbage"] = 0
+        # Leave out the spare capacity
+        for name in ("_offsets", "_lengths", "_sources", "_pages", "_starts"):
+            state[name] = state[name][:len(self.ids)].copy()
+        del state["_source_index"]
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        self.__dict__.update(state)
+        self._text = bytearray(self._text)
+        self._source_index = {source: index for index, source in enumerate(self._source_names)}
@@ -0,0 +1,135 @@
+import logging
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Dict, List
+
+from fastapi import HTTPException
+
+from core.config import settings
+from services.document_processor import DocumentProcessor
+
+DEFAULT_COLLECTION = "default"
+COLLECTION_NAME = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_-]{0,63}$")
+# Named collections are stored under this directory of VECTOR_STORE_DIR
+COLLECTIONS_DIR = "collections"
+
+
+def validate_collection(name: str) -> str:
+    """Return name if it can be used as a collection (and directory) name."""
+    if not COLLECTION_NAME.match(name or ""):
+        raise ValueError(
+            f"Invalid collection name {name!r}: use up to 64 letters, digits, '-' or '_'"
+        )
+    return name
+
+
+def collection_files_dir(name: str) -> str:
+    """Directory holding a collection's uploaded files and their exports."""
+    if name == DEFAULT_COLLECTION:
+        return settings.FILES_DIR
+    return os.path.join(settings.FILES_DIR, COLLECTIONS_DIR, name)
+
+
+def collection_store_dir(name: str) -> str:
+    """Directory holding a collection's vector store snapshots."""
+    if name == DEFAULT_COLLECTION:
+        return settings.VECTOR_STORE_DIR
+    return os.path.join(settings.VECTOR_STORE_DIR, COLLECTIONS_DIR, name)
+
+
+class CollectionManager:
+    """Named document collections, each with its own vector store.
+
+    A collection's DocumentProcessor is loaded on first use and kept in an
+    LRU of at most max_loaded entries; the least recently used one is
+    dropped from memory when another is loaded. Each processor has its own
+    write lock and store directory, so ingesting into one collection never
+    blocks queries against another. Collections are only evicted when they
+    are persisted, since an in-memory store would otherwise be lost.
+    """
+
+    def __init__(self, max_loaded: int = settings.MAX_LOADED_COLLECTIONS):
+        self.max_loaded = max_loaded
+        self._loaded: "OrderedDict[str, DocumentProcessor]" = OrderedDict()
+        self._loading: Dict[str, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def exists(self, name: str) -> bool:
+        with self._lock:
+            if name in self._loaded:
+                return True
+        return name == DEFAULT_COLLECTION or os.path.isdir(collection_files_dir(name))
+
+    def names(self) -> List[str]:
+        """Names of the loaded collections and those with files on disk."""
+        names = {DEFAULT_COLLECTION}
+        root = os.path.join(settings.FILES_DIR, COLLECTIONS_DIR)
+        if os.path.isdir(root):
+            names.update(n for n in os.listdir(root) if COLLECTION_NAME.match(n))
+        with self._lock:
+            names.update(self._loaded)
+        return sorted(names)
+
+    def get(self, name: str, create: bool = False) -> DocumentProcessor:
+        """Return the processor of a collection, loading it if needed.
+
+        Raises ValueError for an invalid name and KeyError for a collection
+        that does not exist, unless create is set.
+        """
+        validate_collection(name)
+        with self._lock:
+            processor = self._loaded.get(name)
+            if processor is not None:
+                self._loaded.move_to_end(name)
+                return processor
+            loading = self._loading.setdefault(name, threading.Lock())
+
+        # Load outside the manager lock so other collections stay available
+        with loading:
+            with self._lock:
+                processor = self._loaded.get(name)
+            if processor is None:
+                if not create and not self.exists(name):
+                    raise KeyError(f"Collection {name} not found")
+                os.makedirs(collection_files_dir(name), exist_ok=True)
+                store_dir = collection_store_dir(name) if settings.PERSIST_VECTOR_STORE else None
+                processor = DocumentProcessor(store_dir=store_dir)
+                logging.info(f"Loaded collection {name}.")
+
+        with self._lock:
+            self._loaded[name] = processor
+            self._loaded.move_to_end(name)
+            self._evict()
+        return processor
+
+    def _evict(self) -> None:
+        if not settings.PERSIST_VECTOR_STORE:
+            return
+        for name in list(self._loaded):
+            if len(self._loaded) <= self.max_loaded:
+                break
+            processor = self._loaded[name]
+            # Keep collections that are being written; they are retried next time
+            if name == next(reversed(self._loaded)) or processor.busy:
+                continue
+            del self._loaded[name]
+            logging.info(f"Evicted collection {name} from memory.")
+
+    def loaded(self) -> List[str]:
+        with self._lock:
+            return list(self._loaded)
+
+
+collection_manager = CollectionManager()
+
+
+def get_collection(name: str, create: bool = False) -> DocumentProcessor:
+    """collection_manager.get() for request handlers, raising HTTP 400/404."""
+    try:
+        return collection_manager.get(name, create=create)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except KeyError:
+        raise HTTPException(status_code=404, detail=f"Collection {name} not found")
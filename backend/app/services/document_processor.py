@@ -1,70 +1,684 @@
-from langchain.text_splitter import RecursiveCharacterTextSplitter
-from langchain_community.document_loaders import PyPDFLoader  # Updated imports
-from langchain.vectorstores import FAISS  # Use FAISS instead of Chroma
-from typing import List
+from contextlib import contextmanager
+from typing import Collection, Dict, List, Optional, Tuple
 
-from langchain_community.embeddings import HuggingFaceEmbeddings
 from core.config import settings
+from services.chunk_index import ChunkIndex, pack_digests, unpack_digests
+from services.embedding_service import embedding_service
+from services.lexical_index import LexicalIndex
+from services.metrics import timed
+from services.reranker import reranker
+from services.vector_store import VectorStore
+from utils.file_utils import extract_pdf, split_document
+from utils.rwlock import ReadWriteLock
 from dotenv import load_dotenv
+import fcntl
+import hashlib
+import json
 import os
+import pickle
+import shutil
+import struct
+import threading
+import time
+import uuid
 from langchain.schema import Document
 import logging
+import numpy as np
 
-logging.basicConfig(level=logging.INFO)
+logging.basicConfig(level=settings.LOG_LEVEL)
 
 
 load_dotenv()
 
+SNAPSHOT_POINTER = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+LEXICAL_FILE = "lexical.pkl"
+CHUNK_INDEX_FILE = "chunk_index.pkl"
+JOURNAL_FILE = "journal.log"
+LOCK_FILE = ".lock"
+# Journal records are pickles, each preceded by its length
+RECORD_HEADER = struct.Struct("<Q")
+
+
+def hash_text(text: str) -> str:
+    """Return the content digest used to deduplicate chunks."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def hash_file(file_path: str, block_size: int = 1 << 20) -> str:
+    """Return the content digest of a file, read in blocks."""
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_journal(path: str, offset: int) -> Tuple[List[dict], int]:
+    """Return the complete records after offset and the offset past the last one."""
+    records = []
+    try:
+        f = open(path, "rb")
+    except FileNotFoundError:
+        return records, offset
+    with f:
+        f.seek(offset)
+        while True:
+            header = f.read(RECORD_HEADER.size)
+            if len(header) < RECORD_HEADER.size:
+                break
+            (size,) = RECORD_HEADER.unpack(header)
+            payload = f.read(size)
+            if len(payload) < size:
+                break  # still being written, or cut short by a crash
+            records.append(pickle.loads(payload))
+            offset += RECORD_HEADER.size + size
+    return records, offset
+
+
+def append_journal(path: str, offset: int, records: List[dict]) -> int:
+    """Write records at offset, dropping anything after it, and return the new end."""
+    fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+    with os.fdopen(fd, "r+b") as f:
+        f.truncate(offset)
+        f.seek(offset)
+        for record in records:
+            payload = pickle.dumps(record, protocol=pickle.HIGHEST_PROTOCOL)
+            f.write(RECORD_HEADER.pack(len(payload)))
+            f.write(payload)
+        f.flush()
+        os.fsync(f.fileno())
+        return f.tell()
+
+
+def snapshot_size(path: str) -> int:
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.name != JOURNAL_FILE)
+
+
 class DocumentProcessor:
-    def __init__(self):
-        self.text_splitter = RecursiveCharacterTextSplitter(
-            chunk_size=settings.CHUNK_SIZE,
-            chunk_overlap=settings.CHUNK_OVERLAP,
-        )
-        self.embeddings = HuggingFaceEmbeddings(model_name="thenlper/gte-large")
-        self.vector_store = None
+    """Chunks, vectors and file index of one document collection."""
+
+    def __init__(self, store_dir: Optional[str] = None):
+        self.embeddings = embedding_service
+        self.vector_store: Optional[VectorStore] = None
+        # BM25 index over the same chunks, keyed by docstore id
+        self.lexical_index = LexicalIndex()
+        # Content-hash index kept alongside the vector store: chunk digest
+        # -> docstore id and the number of files referencing the chunk,
+        # file name -> file digest, and file name -> the raw digests of
+        # every chunk the file contains (see pack_digests()).
+        self.chunk_index = ChunkIndex()
+        self.file_digests: Dict[str, str] = {}
+        self.file_chunks: Dict[str, bytes] = {}
+        # Bumped on every change to the store
+        self.version = 0
+        # _write_lock serialises changes, which are mostly prepared outside
+        # _rw (parsing, embedding, saving) and only take its write side to
+        # apply them; queries hold its read side. _load_lock guards swapping
+        # in a snapshot. Queries never wait for one to load: they serve what
+        # is in memory and leave newer changes to a background refresh.
+        self._write_lock = threading.Lock()
+        self._rw = ReadWriteLock()
+        self._load_lock = threading.Lock()
+        self._refresher: Optional[threading.Thread] = None
+
+        # Under store_dir, CURRENT names the latest complete snapshot. Each
+        # change is appended to that snapshot's journal, which every worker
+        # replays; once the journal grows past SNAPSHOT_COMPACT_RATIO of the
+        # snapshot, a background thread writes a new snapshot.
+        if store_dir is None and settings.PERSIST_VECTOR_STORE:
+            store_dir = settings.VECTOR_STORE_DIR
+        self.store_dir = store_dir
+        self.snapshot: Optional[str] = None
+        # Bytes of the snapshot's journal applied so far, and its files' size
+        self._journal_end = 0
+        self._snapshot_bytes = 0
+        # True while the vector store is memory-mapped from the snapshot
+        self._mapped = False
+        self._compactor: Optional[threading.Thread] = None
+        if self.store_dir:
+            os.makedirs(self.store_dir, exist_ok=True)
+            self._refresh()
 
 
-    def process_document(self, file_path: str) -> None:
-        """Process a single document and add it to vector store"""
+    @property
+    def busy(self) -> bool:
+        """True while a change to the store is in progress."""
+        return self._write_lock.locked()
+
+    def process_document(self, file_path: str, texts: Optional[List[Document]] = None,
+                         file_digest: Optional[str] = None) -> int:
+        """Process a single document and add its new chunks to the vector store.
+
+        Returns the number of chunks added. Files whose content digest matches
+        the last indexed version are skipped without parsing or embedding; a
+        changed file replaces the chunks of its previous version, keeping the
+        vectors of chunks both versions share. Chunks from
+        parse_pdf_pages() and a precomputed file digest may be passed in.
+        """
         if not os.path.isfile(file_path):
             raise ValueError(f"File path {file_path} is not a valid file or url")
-        
-        loader = PyPDFLoader(file_path=file_path)
-        documents = loader.load()
-        texts = self.text_splitter.split_documents(documents)
-        
-        if not self.vector_store:
+
+        file_name = os.path.basename(file_path)
+        file_digest = file_digest or hash_file(file_path)
+        self._refresh()
+        if self.is_indexed(file_name, file_digest):
+            logging.info(f"{file_name} is unchanged, skipping.")
+            return 0
+
+        if texts is None:
+            texts = split_document(extract_pdf(file_path))
+        digests = [hash_text(text.page_content) for text in texts]
+        # Embed before taking any lock, so queries never wait on the model
+        with timed("ingest_embed"):
+            vectors = self._embed_new(texts, digests)
+
+        with timed("ingest_index"), self._mutation() as journal:
+            ids, new_vectors = self._apply_file(file_name, file_digest, texts, digests, vectors)
+            journal.append({"op": "file", "file_name": file_name, "file_digest": file_digest,
+                            "texts": texts, "digests": digests, "ids": ids, "vectors": new_vectors})
+        return len(ids)
+
+    def _apply_file(self, file_name: str, file_digest: str, texts: List[Document], digests: List[str],
+                    vectors: Dict[str, np.ndarray], ids: Optional[Dict[str, str]] = None):
+        if file_name in self.file_digests:
+            # Chunks the new version still contains keep their vectors
+            self._delete_chunks(file_name, keep=set(digests))
+
+        added = self._add_chunks(texts, digests, vectors, ids)
+        self.file_digests[file_name] = file_digest
+        unique = list(dict.fromkeys(digests))
+        self.file_chunks[file_name] = pack_digests(unique)
+        for digest in unique:
+            self.chunk_index.add_ref(digest)
+        return added
+
+    def _embed_new(self, texts: List[Document], digests: List[str]) -> Dict[str, np.ndarray]:
+        """Embed the distinct chunks that are not indexed yet, keyed by digest."""
+        self._refresh()
+        with self._rw.read():
+            pending = {digest: text.page_content for text, digest in zip(texts, digests)
+                       if digest not in self.chunk_index}
+        if not pending:
+            return {}
+        return dict(zip(pending, self.embeddings.embed(list(pending.values()))))
+
+    def _add_chunks(self, texts: List[Document], digests: List[str],
+                    vectors: Optional[Dict[str, np.ndarray]] = None,
+                    ids: Optional[Dict[str, str]] = None) -> Tuple[Dict[str, str], Optional[np.ndarray]]:
+        """Store the chunks whose digest is not indexed yet.
+
+        vectors holds embeddings computed by _embed_new(); chunks missing
+        from it are embedded here. ids gives the docstore ids to use when
+        replaying a journal record. Returns the digest -> docstore id of the
+        chunks added and their vectors, in the same order.
+        """
+        new_ids: Dict[str, str] = {}
+        new_texts: List[Document] = []
+        for text, digest in zip(texts, digests):
+            if digest in self.chunk_index or digest in new_ids:
+                continue
+            new_ids[digest] = ids[digest] if ids is not None else str(uuid.uuid4())
+            new_texts.append(text)
+
+        if not new_texts:
+            logging.info("No new documents to add.")
+            return new_ids, None
+
+        logging.info(f"Adding {len(new_texts)} new documents to the vector store.")
+        vectors = dict(vectors or {})
+        missing = [(digest, text) for digest, text in zip(new_ids, new_texts) if digest not in vectors]
+        if missing:
+            vectors.update(zip(
+                [digest for digest, _ in missing],
+                self.embeddings.embed([text.page_content for _, text in missing]),
+            ))
+        vectors = np.stack([vectors[digest] for digest in new_ids])
+        if self.vector_store is None:
             logging.info("Creating vector store for the first time.")
-            self.vector_store = FAISS.from_documents(texts, self.embeddings)
-            logging.info(f"Adding {len(texts)} new documents to the vector store.")
-        else:
-            # Check if the documents are already in the vector store
-            logging.info("Checking for duplicate documents in the vector store.")
-            existing_docs = [doc.page_content for doc in self.vector_store.similarity_search("", k=len(self.vector_store.index_to_docstore_id))]
-            new_texts = [text for text in texts if text.page_content not in existing_docs]
-            
-            if new_texts:
-                logging.info(f"Adding {len(new_texts)} new documents to the vector store.")
-                self.vector_store.add_documents(new_texts)
-            else:
-                logging.info("No new documents to add.")
+            rescore = None
+            if not self.store_dir and settings.VECTOR_INDEX_QUANTIZATION != "none" and settings.VECTOR_INDEX_RESCORE:
+                # Without a snapshot to map them from, the float32 copies would
+                # stay on the heap and outweigh what quantization saves
+                logging.warning("Rescoring is disabled because the vector store is not persisted.")
+                rescore = 0
+            self.vector_store = VectorStore(vectors.shape[1], rescore=rescore)
+        self.vector_store.add(list(new_ids.values()), new_texts, vectors, rebuild=False)
+        for doc_id, text in zip(new_ids.values(), new_texts):
+            self.lexical_index.add(doc_id, text.page_content)
+        for digest, doc_id in new_ids.items():
+            self.chunk_index.add(digest, doc_id)
+        return new_ids, vectors
+
+    def delete_document(self, file_name: str) -> int:
+        """Remove a file's chunks from the vector store.
+
+        Only the vectors belonging to this file are touched; chunks that are
+        also part of another indexed file are kept. Returns the count removed.
+        """
+        with self._mutation() as journal:
+            journal.append({"op": "delete", "file_name": file_name})
+            return self._delete_chunks(file_name)
+
+    def _delete_chunks(self, file_name: str, keep: Collection[str] = ()) -> int:
+        """Release a file's chunks, removing those no other file references
+        unless their digest is in keep."""
+        digests = unpack_digests(self.file_chunks.pop(file_name, b""))
+        self.file_digests.pop(file_name, None)
+
+        ids = []
+        for digest in digests:
+            if self.chunk_index.release(digest) > 0 or digest in keep:
+                continue
+            doc_id = self.chunk_index.pop(digest)
+            if doc_id is not None:
+                ids.append(doc_id)
+
+        if self.vector_store is None or not ids:
+            return 0
+        for doc_id in ids:
+            self.lexical_index.remove(doc_id)
+        removed = self.vector_store.delete(ids, rebuild=False)
+        logging.info(f"Removed {removed} chunks of {file_name} from the vector store.")
+        return removed
+
+    def is_indexed(self, file_name: str, file_digest: Optional[str] = None) -> bool:
+        """Return True if the file (optionally with this exact content) is indexed."""
+        self._refresh_soon()
+        with self._rw.read():
+            if file_digest is None:
+                return file_name in self.file_digests
+            return self.file_digests.get(file_name) == file_digest
+
+    def embed_query(self, query: str) -> np.ndarray:
+        with timed("embed_query"):
+            return self.embeddings.embed([query])[0]
+
+    def search(self, vector, k: int = 4) -> List[Tuple[str, Document, float]]:
+        """Return (docstore id, document, distance) for the k nearest chunks."""
+        return self.search_many(vector, k)[0]
 
+    def search_many(self, vectors, k: int = 4) -> List[List[Tuple[str, Document, float]]]:
+        """search() for several query vectors with one FAISS call."""
+        self._refresh_soon()
+        with self._rw.read():
+            if self.vector_store is None:
+                raise ValueError("Vector store is not initialized. Please process documents first.")
+            with timed("vector_search"):
+                return self.vector_store.search_many(vectors, k)
+
+    def hybrid_search(self, query: str, k: int = 4, vector=None) -> List[Tuple[str, Document, float]]:
+        """Return (docstore id, document, score) for the k best chunks.
+
+        Dense FAISS hits and BM25 hits are merged with reciprocal rank
+        fusion, then optionally re-ordered by the cross-encoder. Pass the
+        query embedding as vector if it has already been computed.
+        """
+        if vector is None:
+            vector = self.embed_query(query)
+        return self.hybrid_search_many([query], k, vectors=[vector])[0]
+
+    def hybrid_search_many(self, queries: List[str], k: int = 4,
+                           vectors=None) -> List[List[Tuple[str, Document, float]]]:
+        """hybrid_search() for several queries, with one batched FAISS search.
+
+        vectors are the query embeddings; they are computed in a single
+        pass if not given.
+        """
+        if vectors is None:
+            with timed("embed_query"):
+                vectors = self.embeddings.embed(list(queries))
+        if not settings.HYBRID_SEARCH:
+            return self.search_many(vectors, k)
+
+        candidates = max(k, settings.RETRIEVAL_CANDIDATES)
+        self._refresh_soon()
+        # Both retrievers read the same version of the store
+        with self._rw.read():
+            if self.vector_store is None:
+                raise ValueError("Vector store is not initialized. Please process documents first.")
+            with timed("vector_search"):
+                dense = self.vector_store.search_many(vectors, candidates)
+            fused = []
+            for query, dense_hits in zip(queries, dense):
+                with timed("lexical_search"):
+                    lexical = self.lexical_index.search(query, candidates)
+                fused.append(self._fuse(dense_hits, lexical))
+
+        if reranker:
+            with timed("rerank"):
+                fused = reranker.rerank_many(list(queries), [hits[:settings.RERANK_CANDIDATES] for hits in fused])
+        return [hits[:k] for hits in fused]
+
+    def _fuse(self, dense: List[Tuple[str, Document, float]],
+              lexical: List[Tuple[str, float]]) -> List[Tuple[str, Document, float]]:
+        """Merge dense and BM25 rankings with reciprocal rank fusion."""
+        scores: Dict[str, float] = {}
+        for ranking in ([doc_id for doc_id, _, _ in dense], [doc_id for doc_id, _ in lexical]):
+            for rank, doc_id in enumerate(ranking):
+                scores[doc_id] = scores.get(doc_id, 0.0) + 1.0 / (settings.RRF_K + rank + 1)
+
+        docstore = self.vector_store.docstore
+        return [(doc_id, docstore[doc_id], score)
+                for doc_id, score in sorted(scores.items(), key=lambda item: item[1], reverse=True)
+                if doc_id in docstore]
 
     def query_documents(self, query: str, k: int = 4) -> List[str]:
         """Query the vector store for relevant documents"""
-        if not self.vector_store:
-            raise ValueError("Vector store is not initialized. Please process documents first.")
-        docs = self.vector_store.similarity_search(query, k=k)
-        return [doc.page_content for doc in docs]
+        return [doc.page_content for _, doc, _ in self.hybrid_search(query, k)]
 
     def process_documents(self, texts: List[str]) -> None:
         """Process a list of text documents and add them to the vector store."""
         documents = [Document(page_content=text) for text in texts]
-        
-        if not self.vector_store:
-            self.vector_store = FAISS.from_documents(documents, self.embeddings)
+        digests = [hash_text(text) for text in texts]
+        vectors = self._embed_new(documents, digests)
+        with self._mutation() as journal:
+            ids, new_vectors = self._apply_texts(documents, digests, vectors)
+            journal.append({"op": "texts", "texts": documents, "digests": digests,
+                            "ids": ids, "vectors": new_vectors})
+
+    def _apply_texts(self, documents: List[Document], digests: List[str],
+                     vectors: Dict[str, np.ndarray], ids: Optional[Dict[str, str]] = None):
+        added = self._add_chunks(documents, digests, vectors, ids)
+        # Chunks without a source file are never released by a file delete
+        for digest in set(digests):
+            self.chunk_index.add_ref(digest)
+        return added
+
+    def _replay(self, record: dict) -> None:
+        """Apply a journal record written by another worker (or before a restart)."""
+        ids = record.get("ids") or {}
+        vectors = dict(zip(ids, record["vectors"])) if record.get("vectors") is not None else {}
+        if record["op"] == "file":
+            self._apply_file(record["file_name"], record["file_digest"], record["texts"], record["digests"],
+                             vectors, ids)
+        elif record["op"] == "delete":
+            self._delete_chunks(record["file_name"])
+        elif record["op"] == "texts":
+            self._apply_texts(record["texts"], record["digests"], vectors, ids)
+        self.version = record["version"]
+
+    @contextmanager
+    def _mutation(self):
+        """Apply a change to the store and persist it.
+
+        The body applies the change and appends a journal record describing
+        it to the yielded list. Changes are serialised between threads, and
+        the store directory is locked for the duration so that several
+        workers sharing it never overwrite each other's changes. Queries are
+        only held off while the change is applied in memory, not while it is
+        prepared, indexed or written.
+        """
+        with self._write_lock:
+            records: List[dict] = []
+            if not self.store_dir:
+                with self._rw.write():
+                    yield records
+                    self.version += 1
+                self._rebuild_index()
+                return
+
+            with self._store_lock():
+                self._refresh()
+                self._ensure_private_store()
+                with self._rw.write():
+                    yield records
+                    self.version += 1
+                self._rebuild_index()
+                for record in records:
+                    record["version"] = self.version
+                if self.snapshot is None:
+                    self._save()
+                    return
+                journal_path = os.path.join(self.store_dir, self.snapshot, JOURNAL_FILE)
+                # Keep _refresh() from replaying our own records
+                with self._load_lock:
+                    self._journal_end = append_journal(journal_path, self._journal_end, records)
+                if self._journal_end > settings.SNAPSHOT_COMPACT_RATIO * self._snapshot_bytes:
+                    self._compact_soon()
+
+    @contextmanager
+    def _store_lock(self):
+        """Hold the store directory's lock, shared by every worker."""
+        with open(os.path.join(self.store_dir, LOCK_FILE), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_private_store(self) -> None:
+        """Swap a memory-mapped vector store for an in-memory copy that can be changed."""
+        if not self._mapped:
+            return
+        private_copy = VectorStore.load(os.path.join(self.store_dir, self.snapshot))
+        with self._rw.write():
+            self.vector_store = private_copy
+            self._mapped = False
+
+    def _compact_soon(self) -> None:
+        """Write a new snapshot, folding in the journal, on a background thread."""
+        if self._compactor is not None and self._compactor.is_alive():
+            return
+        self._compactor = threading.Thread(target=self._compact, name="snapshot-compactor", daemon=True)
+        self._compactor.start()
+
+    def _compact(self) -> None:
+        try:
+            with self._write_lock, self._store_lock():
+                self._refresh()
+                # Another worker may have compacted it already
+                if self._journal_end:
+                    self._save()
+        except Exception:
+            logging.exception("Failed to write a vector store snapshot")
+
+    def _rebuild_index(self) -> None:
+        """Train or rebuild the vector index if the last change calls for it.
+
+        The new index is built while queries go on reading the current one;
+        only swapping it in holds them off.
+        """
+        store = self.vector_store
+        if store is None or not store.needs_rebuild:
+            return
+        try:
+            index = store.build_index()
+        except Exception:
+            # The current index is still complete; the next change retries
+            logging.exception("Failed to rebuild the vector index")
+            return
+        with self._rw.write():
+            store.install(index)
+
+    def _current_snapshot(self) -> Optional[str]:
+        try:
+            with open(os.path.join(self.store_dir, SNAPSHOT_POINTER), "r") as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _refresh_soon(self) -> None:
+        """Start loading newer changes in the background if there are any.
+
+        Called on the query path instead of _refresh(), so a query never
+        waits for a snapshot to load or a journal to replay; it answers from
+        the state in memory, which the refresh swaps under the write lock.
+        Only a worker with nothing loaded yet waits, as it has no state to
+        serve.
+        """
+        if not self.store_dir:
+            return
+        if self.snapshot is None:
+            self._refresh()
+            return
+        if not self._load_lock.acquire(blocking=False):
+            return
+        try:
+            if self._refresher is not None and self._refresher.is_alive():
+                return
+            stale = self._current_snapshot() != self.snapshot
+            if not stale:
+                try:
+                    journal = os.path.getsize(os.path.join(self.store_dir, self.snapshot, JOURNAL_FILE))
+                except FileNotFoundError:
+                    journal = 0
+                stale = journal > self._journal_end
+            if stale:
+                self._refresher = threading.Thread(target=self._refresh_in_background,
+                                                   name="snapshot-refresher", daemon=True)
+                self._refresher.start()
+        finally:
+            self._load_lock.release()
+
+    def _refresh_in_background(self) -> None:
+        try:
+            # Changes in this process refresh first anyway
+            with self._write_lock:
+                self._refresh()
+        except Exception:
+            logging.exception("Failed to load newer vector store changes")
+
+    def _refresh(self) -> None:
+        """Load the latest snapshot if it is newer than the one in memory, then
+        replay the journal records written since."""
+        if not self.store_dir:
+            return
+        with self._load_lock:
+            for attempt in range(3):
+                snapshot = self._current_snapshot()
+                if not snapshot:
+                    return
+                try:
+                    if snapshot != self.snapshot:
+                        self._load(snapshot)
+                    self._catch_up()
+                    return
+                except (FileNotFoundError, RuntimeError):
+                    # FAISS raises RuntimeError for a missing file. If CURRENT
+                    # moved on, the snapshot was pruned while being read.
+                    if attempt == 2 or self._current_snapshot() == snapshot:
+                        raise
+                    logging.info(f"Snapshot {snapshot} was replaced while loading; retrying.")
+
+    def _catch_up(self) -> None:
+        """Replay the snapshot's journal records this worker has not applied yet."""
+        records, end = read_journal(os.path.join(self.store_dir, self.snapshot, JOURNAL_FILE), self._journal_end)
+        records = [record for record in records if record["version"] > self.version]
+        if records:
+            self._ensure_private_store()
+            with self._rw.write():
+                for record in records:
+                    self._replay(record)
+            self._rebuild_index()
+            logging.info(f"Replayed {len(records)} changes from the journal of {self.snapshot}.")
+        self._journal_end = end
+
+    def _load(self, snapshot: str) -> None:
+        """Read a snapshot, then swap it in while no query is running."""
+        path = os.path.join(self.store_dir, snapshot)
+        with open(os.path.join(path, MANIFEST_FILE), "r", encoding="utf-8") as f:
+            manifest = json.load(f)
+
+        if "chunk_index" in manifest:
+            # Written before the content-hash maps moved out of the manifest
+            chunk_index = ChunkIndex.from_maps(manifest["chunk_index"], manifest["chunk_refs"])
+            file_chunks = {name: pack_digests(digests) for name, digests in manifest["file_chunks"].items()}
         else:
-            self.vector_store.add_documents(documents)
+            with open(os.path.join(path, CHUNK_INDEX_FILE), "rb") as f:
+                chunk_index, file_chunks = pickle.load(f)
+
+        vector_store = None
+        lexical_index = LexicalIndex()
+        if manifest["has_vectors"]:
+            vector_store = VectorStore.load(path, mmap=settings.VECTOR_STORE_MMAP)
+            lexical_path = os.path.join(path, LEXICAL_FILE)
+            if os.path.exists(lexical_path):
+                with open(lexical_path, "rb") as f:
+                    lexical_index = pickle.load(f)
+            else:
+                for doc_id, doc in vector_store.docstore.items():
+                    lexical_index.add(doc_id, doc.page_content)
+
+        with self._rw.write():
+            self.vector_store = vector_store
+            self.lexical_index = lexical_index
+            self.chunk_index = chunk_index
+            self.file_digests = manifest["file_digests"]
+            self.file_chunks = file_chunks
+            self.version = manifest["version"]
+            self.snapshot = snapshot
+            self._journal_end = 0
+            self._snapshot_bytes = snapshot_size(path)
+            self._mapped = vector_store is not None and settings.VECTOR_STORE_MMAP
+        logging.info(f"Loaded vector store snapshot {snapshot} ({len(self.chunk_index)} chunks).")
+
+    def _save(self) -> None:
+        """Write a new snapshot with an empty journal and atomically point CURRENT at it."""
+        snapshot = f"snapshot-{self.version:08d}"
+        path = os.path.join(self.store_dir, snapshot)
+        tmp_path = os.path.join(self.store_dir, f".{snapshot}.tmp")
+        shutil.rmtree(tmp_path, ignore_errors=True)
+        shutil.rmtree(path, ignore_errors=True)  # left over from an interrupted save
+        os.makedirs(tmp_path)
+
+        if self.vector_store is not None:
+            self.vector_store.save(tmp_path)
+            with open(os.path.join(tmp_path, LEXICAL_FILE), "wb") as f:
+                pickle.dump(self.lexical_index, f)
+        with open(os.path.join(tmp_path, CHUNK_INDEX_FILE), "wb") as f:
+            pickle.dump((self.chunk_index, self.file_chunks), f, protocol=pickle.HIGHEST_PROTOCOL)
+        manifest = {
+            "version": self.version,
+            "has_vectors": self.vector_store is not None,
+            "file_digests": self.file_digests,
+        }
+        with open(os.path.join(tmp_path, MANIFEST_FILE), "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        os.rename(tmp_path, path)
+
+        pointer_tmp = os.path.join(self.store_dir, f"{SNAPSHOT_POINTER}.tmp")
+        with open(pointer_tmp, "w") as f:
+            f.write(snapshot)
+            f.flush()
+            os.fsync(f.fileno())
+        # Keep _refresh() from reloading our own snapshot in between
+        with self._load_lock:
+            os.replace(pointer_tmp, os.path.join(self.store_dir, SNAPSHOT_POINTER))
+            self.snapshot = snapshot
+            self._journal_end = 0
+            self._snapshot_bytes = snapshot_size(path)
+
+        self._prune_snapshots(snapshot)
+
+        if settings.VECTOR_STORE_MMAP and self.vector_store is not None:
+            vector_store = VectorStore.load(path, mmap=True)
+            with self._rw.write():
+                self.vector_store = vector_store
+                self._mapped = True
+
+    def _prune_snapshots(self, current: str) -> None:
+        """Delete snapshots superseded more than SNAPSHOT_RETENTION_SECONDS ago,
+        and all but the SNAPSHOT_MAX_RETAINED newest superseded ones.
 
-document_processor = DocumentProcessor()
\ No newline at end of file
+        Other workers may have read CURRENT just before it moved and still be
+        loading the snapshot it named, so each one is kept for a while after
+        its successor was written.
+        """
+        snapshots = sorted(name for name in os.listdir(self.store_dir) if name.startswith("snapshot-"))
+        superseded = [name for name in snapshots if name != current]
+        recent = set(superseded[len(superseded) - settings.SNAPSHOT_MAX_RETAINED:]) \
+            if settings.SNAPSHOT_MAX_RETAINED > 0 else set()
+        cutoff = time.time() - settings.SNAPSHOT_RETENTION_SECONDS
+        for name, successor in zip(snapshots, snapshots[1:]):
+            if name == current:
+                continue
+            if name not in recent:
+                shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
+                continue
+            try:
+                superseded = os.stat(os.path.join(self.store_dir, successor)).st_mtime
+            except FileNotFoundError:
+                continue
+            if superseded < cutoff:
+                shutil.rmtree(os.path.join(self.store_dir, name), ignore_errors=True)
@@ -1,11 +1,194 @@
+import hashlib
 import json
-from sentence_transformers import SentenceTransformer
+import logging
 import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Sequence
+
 import numpy as np
+from langchain_core.embeddings import Embeddings
+
+from core.config import settings
 from utils.file_utils import process_pdf_to_markdown
 
-# Load SentenceTransformer model
-model = SentenceTransformer("thenlper/gte-large")
+
+class EmbeddingCache:
+    """Disk-backed embedding cache keyed on (model, text hash).
+
+    Backed by SQLite in WAL mode, so several worker processes can share it.
+    The database is opened on first use. Beyond max_entries vectors, the
+    least recently used ones are evicted.
+    """
+
+    # Evict once the table is this much over max_entries, so eviction is batched
+    EVICTION_SLACK = 1.1
+
+    def __init__(self, path: str, max_entries: int = settings.EMBEDDING_CACHE_MAX_ENTRIES):
+        self.path = path
+        self.max_entries = max_entries
+        self._conn: Optional[sqlite3.Connection] = None
+        # Rows written since the table was last counted, plus that count
+        self._entries = 0
+        self._lock = threading.Lock()
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings "
+                "(key TEXT PRIMARY KEY, vector BLOB NOT NULL, used REAL NOT NULL DEFAULT 0)"
+            )
+            if "used" not in {row[1] for row in conn.execute("PRAGMA table_info(embeddings)")}:
+                # Cache written before eviction; its rows count as least recently used
+                conn.execute("ALTER TABLE embeddings ADD COLUMN used REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS embeddings_used ON embeddings (used)")
+            self._entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, np.ndarray]:
+        found: Dict[str, np.ndarray] = {}
+        with self._lock:
+            conn = self._connection()
+            # Stay well below SQLite's bound-parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start:start + 500]
+                placeholders = ",".join("?" * len(batch))
+                rows = conn.execute(
+                    f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", batch,
+                ).fetchall()
+                for key, blob in rows:
+                    found[key] = np.frombuffer(blob, dtype=np.float32)
+                if rows and self.max_entries:
+                    conn.execute(f"UPDATE embeddings SET used = ? WHERE key IN ({','.join('?' * len(rows))})",
+                                 [time.time(), *(key for key, _ in rows)])
+        return found
+
+    def put_many(self, items: Dict[str, np.ndarray]) -> None:
+        with self._lock:
+            conn = self._connection()
+            used = time.time()
+            conn.execute("BEGIN")
+            conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (key, vector, used) VALUES (?, ?, ?)",
+                [(key, np.asarray(vector, dtype=np.float32).tobytes(), used) for key, vector in items.items()],
+            )
+            conn.execute("COMMIT")
+            self._entries += len(items)
+            if self.max_entries and self._entries > self.max_entries * self.EVICTION_SLACK:
+                self._evict(conn)
+
+    def _evict(self, conn: sqlite3.Connection) -> None:
+        """Delete the least recently used vectors beyond max_entries."""
+        entries = conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+        if entries > self.max_entries:
+            conn.execute(
+                "DELETE FROM embeddings WHERE key IN (SELECT key FROM embeddings ORDER BY used LIMIT ?)",
+                (entries - self.max_entries,),
+            )
+            logging.info(f"Evicted {entries - self.max_entries} vectors from the embedding cache.")
+        self._entries = min(entries, self.max_entries)
+
+
+class EmbeddingService(Embeddings):
+    """The single sentence-transformer model used by the whole application.
+
+    Texts are encoded in batches of EMBEDDING_BATCH_SIZE, and every vector is
+    cached on disk so identical chunks and repeated queries are encoded once.
+    The model (and torch) is only loaded when a text actually has to be
+    encoded, or by load() from the startup warm-up.
+    """
+
+    def __init__(self, model_name: str = settings.EMBEDDING_MODEL,
+                 batch_size: int = settings.EMBEDDING_BATCH_SIZE,
+                 num_threads: int = settings.EMBEDDING_THREADS,
+                 cache_path: Optional[str] = settings.EMBEDDING_CACHE_PATH):
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.num_threads = num_threads
+        self.cache = EmbeddingCache(cache_path) if cache_path else None
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Load the model if needed and return it."""
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import SentenceTransformer
+
+                if self.num_threads > 0:
+                    import torch
+                    torch.set_num_threads(self.num_threads)
+                started = time.perf_counter()
+                self._model = SentenceTransformer(self.model_name)
+                logging.info(f"Loaded embedding model {self.model_name} in {time.perf_counter() - started:.1f}s.")
+        return self._model
+
+    @property
+    def loaded(self) -> bool:
+        return self._model is not None
+
+    @property
+    def model(self):
+        return self._model or self.load()
+
+    @property
+    def dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def _cache_key(self, text: str) -> str:
+        return hashlib.sha256(f"{self.model_name}\0{text}".encode("utf-8")).hexdigest()
+
+    def embed(self, texts: List[str]) -> np.ndarray:
+        """Return a (len(texts), dimension) float32 array of embeddings."""
+        if not texts:
+            return np.empty((0, self.dimension), dtype=np.float32)
+        # Rows of each distinct text
+        positions: Dict[str, List[int]] = {}
+        for row, text in enumerate(texts):
+            positions.setdefault(self._cache_key(text), []).append(row)
+        cached = self.cache.get_many(list(positions)) if self.cache else {}
+
+        # Vectors are written straight into one preallocated array
+        dimension = len(next(iter(cached.values()))) if cached else self.dimension
+        vectors = np.empty((len(texts), dimension), dtype=np.float32)
+        for key, vector in cached.items():
+            vectors[positions[key]] = vector
+
+        # Encode each distinct uncached text once
+        missing_keys = [key for key in positions if key not in cached]
+        for start in range(0, len(missing_keys), self.batch_size):
+            batch_keys = missing_keys[start:start + self.batch_size]
+            started = time.perf_counter()
+            encoded = self.model.encode(
+                [texts[positions[key][0]] for key in batch_keys],
+                batch_size=self.batch_size,
+                convert_to_numpy=True,
+            ).astype(np.float32, copy=False)
+            elapsed = time.perf_counter() - started
+            logging.info(
+                f"Embedded batch of {len(batch_keys)} texts in {elapsed:.3f}s "
+                f"({len(batch_keys) / elapsed if elapsed else 0:.1f} texts/s)"
+            )
+            for key, vector in zip(batch_keys, encoded):
+                vectors[positions[key]] = vector
+            if self.cache:
+                self.cache.put_many(dict(zip(batch_keys, encoded)))
+
+        return vectors
+
+    def embed_documents(self, texts: List[str]) -> List[List[float]]:
+        return self.embed(texts).tolist()
+
+    def embed_query(self, text: str) -> List[float]:
+        return self.embed([text])[0].tolist()
+
+
+embedding_service = EmbeddingService()
 
 # Initialize document store and embeddings store
 document_store = []
@@ -17,7 +200,6 @@ def process_documents(files_dir: str):
 
     # Ensure document_store and embeddings_store are initialized
     document_store = []
-    embeddings_store = []
 
     # Iterate through files in the directory
     for file_name in os.listdir(files_dir):
@@ -25,14 +207,10 @@ def process_documents(files_dir: str):
         if file_name.endswith(".pdf"):  # Example for PDF files
             context = process_pdf_to_markdown(file_path)
 
-            embedding = model.encode(context, convert_to_numpy=True)
-
             document_store.append(context)
 
-            embeddings_store.append(embedding)
-
-    # Convert embeddings to a NumPy array
-    embeddings_store = np.array(embeddings_store)
+    # Embed all documents in batches
+    embeddings_store = embedding_service.embed(document_store)
 
     # Log the number of documents processed
     if document_store:
@@ -56,4 +234,4 @@ def process_json_for_embedding(json_path: str):
 
     combined += "\n[Images extracted, OCR if needed]"
 
-    return combined
\ No newline at end of file
+    return combined
@@ -0,0 +1,254 @@
+import logging
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import List, Optional
+
+from core.config import settings
+from services.collection_manager import DEFAULT_COLLECTION, collection_manager
+from services.document_processor import hash_file
+from services.metrics import observe, timed
+from utils.file_utils import ExtractedDocument, parse_pdf_pages, pdf_page_count, write_exports
+
+# Per-file stages, in order, with the share of the work done once reached
+STAGES = {
+    "queued": 0.0,
+    "parsing": 0.1,
+    "embedding": 0.5,
+    "done": 1.0,
+}
+
+
+class FileProgress:
+    """Ingestion state of one file in a job."""
+
+    def __init__(self, filename: str, file_path: str, collection: str = DEFAULT_COLLECTION,
+                 digest: Optional[str] = None):
+        self.filename = filename
+        self.collection = collection
+        # SHA-256 of the content, if computed while the upload was saved
+        self.digest = digest
+        self.file_path = file_path
+        self.stage = "queued"
+        self.chunks_added = 0
+        self.pages = 0
+        self.pages_parsed = 0
+        self.markdown_file: Optional[str] = None
+        self.error: Optional[str] = None
+
+    @property
+    def progress(self) -> float:
+        if self.stage == "parsing" and self.pages:
+            return STAGES["parsing"] + (STAGES["embedding"] - STAGES["parsing"]) * self.pages_parsed / self.pages
+        return STAGES.get(self.stage, 1.0)
+
+    def to_dict(self) -> dict:
+        return {
+            "filename": self.filename,
+            "pdf_file": self.file_path,
+            "sha256": self.digest,
+            "stage": self.stage,
+            "progress": self.progress,
+            "pages": self.pages,
+            "chunks_added": self.chunks_added,
+            "markdown_file": self.markdown_file,
+            "error": self.error,
+        }
+
+
+class IngestJob:
+    """A batch of uploaded files processed in the background."""
+
+    def __init__(self, file_paths: List[str], collection: str = DEFAULT_COLLECTION,
+                 digests: Optional[List[str]] = None):
+        self.id = uuid.uuid4().hex
+        self.collection = collection
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self.files = [
+            FileProgress(os.path.basename(path), path, collection, digest)
+            for path, digest in zip(file_paths, digests or [None] * len(file_paths))
+        ]
+
+    @property
+    def status(self) -> str:
+        stages = {f.stage for f in self.files}
+        if stages <= {"done", "skipped", "failed"}:
+            return "failed" if stages == {"failed"} else "completed"
+        if stages == {"queued"}:
+            return "queued"
+        return "running"
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "collection": self.collection,
+            "status": self.status,
+            "progress": sum(f.progress for f in self.files) / len(self.files) if self.files else 1.0,
+            "created_at": self.created_at,
+            "finished_at": self.finished_at,
+            "files": [f.to_dict() for f in self.files],
+        }
+
+
+class IngestJobManager:
+    """Runs parsing and embedding of uploads off the event loop.
+
+    Each file is handled by a bounded thread pool. The CPU-heavy PDF
+    extraction and splitting is sharded into page ranges that run in a
+    process pool, so one long document uses every core; the results are
+    merged in page order, the Markdown/JSON exports written, and embedding
+    runs in the calling thread against the document processor of the job's
+    collection.
+    """
+
+    def __init__(self, workers: int = settings.INGEST_WORKERS,
+                 parse_processes: int = settings.INGEST_PARSE_PROCESSES,
+                 max_jobs: int = settings.INGEST_MAX_JOBS):
+        self.workers = workers
+        self.parse_processes = parse_processes
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, IngestJob]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._parse_pool: Optional[ProcessPoolExecutor] = None
+
+    def _new_parse_pool(self) -> ProcessPoolExecutor:
+        # spawn, not fork: the parent holds torch and FAISS state
+        return ProcessPoolExecutor(
+            max_workers=self.parse_processes or os.cpu_count(),
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def _pools(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="ingest")
+                self._parse_pool = self._new_parse_pool()
+            return self._executor, self._parse_pool
+
+    def _replace_parse_pool(self, broken: ProcessPoolExecutor) -> Optional[ProcessPoolExecutor]:
+        """Swap a fresh process pool in for one whose worker died, and return the current pool."""
+        with self._lock:
+            # Files that failed on the same pool all land here; only the first replaces it
+            if self._parse_pool is broken:
+                logging.warning("A PDF parse process died; starting a new process pool.")
+                self._parse_pool = self._new_parse_pool()
+                broken.shutdown(wait=False, cancel_futures=True)
+            return self._parse_pool
+
+    def submit(self, file_paths: List[str], collection: str = DEFAULT_COLLECTION,
+               digests: Optional[List[str]] = None) -> IngestJob:
+        """Queue the files for ingestion into a collection and return the job tracking them.
+
+        digests are the files' SHA-256 digests if already known; files whose
+        content is already indexed are then skipped without reading them.
+        """
+        job = IngestJob(file_paths, collection, digests)
+        with self._lock:
+            self._jobs[job.id] = job
+            while len(self._jobs) > self.max_jobs:
+                self._jobs.popitem(last=False)
+
+        executor, _ = self._pools()
+        remaining = [len(job.files)]
+        for item in job.files:
+            future = executor.submit(self._ingest_file, item)
+            future.add_done_callback(lambda _: self._file_finished(job, remaining))
+        return job
+
+    def get(self, job_id: str) -> Optional[IngestJob]:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def shutdown(self, wait: bool = False) -> None:
+        with self._lock:
+            executor, parse_pool = self._executor, self._parse_pool
+            self._executor = self._parse_pool = None
+        if executor:
+            executor.shutdown(wait=wait, cancel_futures=True)
+        if parse_pool:
+            parse_pool.shutdown(wait=wait, cancel_futures=True)
+
+    def _file_finished(self, job: IngestJob, remaining: List[int]) -> None:
+        with self._lock:
+            remaining[0] -= 1
+            if remaining[0] == 0:
+                job.finished_at = time.time()
+
+    def _ingest_file(self, item: FileProgress) -> None:
+        _, parse_pool = self._pools()
+        started = time.perf_counter()
+        try:
+            document_processor = collection_manager.get(item.collection, create=True)
+            file_digest = item.digest or hash_file(item.file_path)
+            item.digest = file_digest
+            base_path = os.path.splitext(item.file_path)[0]
+            markdown_file_path = f"{base_path}.md"
+            json_file_path = f"{base_path}.json" if settings.EXPORT_STRUCTURED_JSON else None
+            if document_processor.is_indexed(item.filename, file_digest) and os.path.exists(markdown_file_path):
+                item.markdown_file = markdown_file_path
+                item.stage = "skipped"
+                return
+
+            # One extraction pass feeds both the exports and the text splitter
+            item.stage = "parsing"
+            item.pages = pdf_page_count(item.file_path)
+            parse_started = time.perf_counter()
+            try:
+                pages, texts = self._parse(item, parse_pool)
+            except BrokenProcessPool:
+                # A parse process died (a MuPDF crash or an OOM kill); the
+                # file gets one more try on a fresh pool
+                parse_pool = self._replace_parse_pool(parse_pool)
+                if parse_pool is None:
+                    raise
+                item.pages_parsed = 0
+                pages, texts = self._parse(item, parse_pool)
+            observe("ingest_parse", time.perf_counter() - parse_started)
+            with timed("ingest_export"):
+                write_exports(ExtractedDocument(file_path=item.file_path, pages=pages),
+                              markdown_file_path, json_file_path)
+            item.markdown_file = markdown_file_path
+
+            item.stage = "embedding"
+            item.chunks_added = document_processor.process_document(
+                item.file_path, texts=texts, file_digest=file_digest
+            )
+            logging.info(f"Processed file: {item.file_path}")
+            observe("ingest_file", time.perf_counter() - started)
+
+            item.stage = "done"
+        except Exception as e:
+            logging.exception(f"Failed to ingest {item.file_path}")
+            item.error = str(e)
+            item.stage = "failed"
+
+    @staticmethod
+    def _parse(item: FileProgress, parse_pool: ProcessPoolExecutor):
+        """Parse the file's page-range shards in the process pool; return (pages, chunks) in page order."""
+        shard = max(1, settings.INGEST_PAGES_PER_SHARD)
+        futures = [
+            parse_pool.submit(parse_pdf_pages, item.file_path, start, min(start + shard, item.pages))
+            for start in range(0, item.pages, shard)
+        ]
+        pages, texts = [], []
+        try:
+            for future in futures:
+                shard_pages, shard_texts = future.result()
+                pages += shard_pages
+                texts += shard_texts
+                item.pages_parsed += len(shard_pages)
+        except Exception:
+            for future in futures:
+                future.cancel()
+            raise
+        return pages, texts
+
+
+ingest_jobs = IngestJobManager()
@@ -0,0 +1,161 @@
+import math
+import re
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+# Identifiers such as part numbers (AX-1234) or clause ids (4.2.1) are kept
+# whole, and their parts are indexed as well.
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were "
+    "what when where which who will with".split()
+)
+
+
+def tokenize(text: str) -> List[str]:
+    tokens = []
+    for token in TOKEN_RE.findall(text.lower()):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[-_./:]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in STOPWORDS)
+    return tokens
+
+
+class LexicalIndex:
+    """Incremental BM25 inverted index over chunk text.
+
+    Only the posting lists of the query's terms are visited, so a search
+    never scans the whole corpus. Each chunk gets an integer slot, and a
+    term's posting list is a flat array of (slot, term frequency) pairs, so
+    a posting costs 8 bytes rather than a dict entry. Removed chunks only
+    give up their slot; their postings are dropped once removed slots make
+    up MAX_GARBAGE_RATIO of all slots.
+    """
+
+    MAX_GARBAGE_RATIO = 0.5
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        # term -> array of slot, term frequency, slot, term frequency, ...
+        self.postings: Dict[str, array] = {}
+        self.slots: Dict[str, int] = {}
+        # slot -> docstore id, None once removed
+        self.doc_ids: List[Optional[str]] = []
+        # slot -> token count, -1 once removed
+        self.doc_lengths = np.zeros(0, dtype=np.int32)
+        self.total_length = 0
+        self._garbage = 0
+
+    def __len__(self) -> int:
+        return len(self.slots)
+
+    def add(self, doc_id: str, text: str) -> None:
+        tokens = tokenize(text)
+        if doc_id in self.slots:
+            self.remove(doc_id)
+        counts: Dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        slot = len(self.doc_ids)
+        for token, count in counts.items():
+            postings = self.postings.get(token)
+            if postings is None:
+                postings = self.postings[token] = array("I")
+            postings.append(slot)
+            postings.append(count)
+        if slot == len(self.doc_lengths):
+            grown = np.full(max(1024, 2 * slot), -1, dtype=np.int32)
+            grown[:slot] = self.doc_lengths
+            self.doc_lengths = grown
+        self.doc_lengths[slot] = len(tokens)
+        self.doc_ids.append(doc_id)
+        self.slots[doc_id] = slot
+        self.total_length += len(tokens)
+
+    def remove(self, doc_id: str) -> None:
+        slot = self.slots.pop(doc_id, None)
+        if slot is None:
+            return
+        self.total_length -= int(self.doc_lengths[slot])
+        self.doc_lengths[slot] = -1
+        self.doc_ids[slot] = None
+        self._garbage += 1
+        if self._garbage > self.MAX_GARBAGE_RATIO * len(self.doc_ids):
+            self._compact()
+
+    def _compact(self) -> None:
+        """Drop the postings of removed chunks and renumber the slots."""
+        live = np.flatnonzero(self.doc_lengths[:len(self.doc_ids)] >= 0)
+        new_slot = np.full(len(self.doc_ids), -1, dtype=np.int64)
+        new_slot[live] = np.arange(len(live))
+        postings = {}
+        for token, entries in self.postings.items():
+            pairs = np.frombuffer(entries, dtype=np.uint32).reshape(-1, 2)
+            slots = new_slot[pairs[:, 0]]
+            kept = slots >= 0
+            if kept.any():
+                pairs = np.column_stack((slots[kept], pairs[kept, 1])).astype(np.uint32)
+                postings[token] = array("I", pairs.tobytes())
+        self.postings = postings
+        self.doc_ids = [self.doc_ids[slot] for slot in live.tolist()]
+        self.slots = {doc_id: slot for slot, doc_id in enumerate(self.doc_ids)}
+        lengths = np.full(max(1024, len(live)), -1, dtype=np.int32)
+        lengths[:len(live)] = self.doc_lengths[live]
+        self.doc_lengths = lengths
+        self._garbage = 0
+
+    def search(self, query: str, k: int) -> List[Tuple[str, float]]:
+        """Return the k best (doc id, BM25 score) pairs for the query."""
+        if not self.slots or k <= 0:
+            return []
+        total_docs = len(self.slots)
+        avg_length = self.total_length / total_docs or 1.0
+        all_slots, all_scores = [], []
+        for token in set(tokenize(query)):
+            entries = self.postings.get(token)
+            if not entries:
+                continue
+            pairs = np.frombuffer(entries, dtype=np.uint32).reshape(-1, 2)
+            lengths = self.doc_lengths[pairs[:, 0]]
+            live = lengths >= 0
+            slots, tf, lengths = pairs[live, 0], pairs[live, 1].astype(np.float64), lengths[live]
+            if not len(slots):
+                continue
+            idf = math.log(1 + (total_docs - len(slots) + 0.5) / (len(slots) + 0.5))
+            norm = self.k1 * (1 - self.b + self.b * lengths / avg_length)
+            all_slots.append(slots)
+            all_scores.append(idf * tf * (self.k1 + 1) / (tf + norm))
+        if not all_slots:
+            return []
+        slots, inverse = np.unique(np.concatenate(all_slots), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(all_scores))
+        best = np.argpartition(-scores, k - 1)[:k] if len(scores) > k else np.arange(len(scores))
+        best = best[np.argsort(-scores[best], kind="stable")]
+        return [(self.doc_ids[slot], float(scores[i])) for slot, i in zip(slots[best].tolist(), best.tolist())]
+
+    def __getstate__(self) -> dict:
+        state = dict(self.__dict__)
+        # Leave out the spare capacity
+        state["doc_lengths"] = self.doc_lengths[:len(self.doc_ids)].copy()
+        return state
+
+    def __setstate__(self, state: dict) -> None:
+        if "slots" not in state:
+            # Pickled before postings were keyed by slot: term -> {doc id: tf}
+            self.__init__(state["k1"], state["b"])
+            for doc_id, length in state["doc_lengths"].items():
+                self.slots[doc_id] = len(self.doc_ids)
+                self.doc_ids.append(doc_id)
+            self.doc_lengths = np.array(list(state["doc_lengths"].values()), dtype=np.int32)
+            self.total_length = state["total_length"]
+            for token, entries in state["postings"].items():
+                self.postings[token] = array("I", [value for doc_id, tf in entries.items()
+                                                   for value in (self.slots[doc_id], tf)])
+            return
+        self.__dict__.update(state)
@@ -0,0 +1,162 @@
+import asyncio
+import heapq
+import itertools
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict, List, Optional
+
+from core.config import settings
+from services.metrics import LLM_QUEUE_LENGTH, LLM_REJECTED, observe
+from services.ollama_service import OllamaClient
+from utils.ollama_errors import OllamaBusyError, OllamaConnectionError
+
+# Lower values are served first
+PRIORITY_INTERACTIVE = 0
+PRIORITY_BATCH = 1
+
+
+def configured_urls() -> List[str]:
+    urls = [url.strip().rstrip("/") for url in settings.OLLAMA_BASE_URLS.split(",") if url.strip()]
+    return urls or [settings.OLLAMA_BASE_URL]
+
+
+class LLMScheduler:
+    """Admission control in front of one or more Ollama endpoints.
+
+    Each endpoint runs at most max_concurrency generations at a time. Up to
+    max_queue more wait for a slot, highest priority first and in arrival
+    order within a priority; beyond that, or after waiting queue_timeout
+    seconds, a generation fails fast with OllamaBusyError. A freed slot goes
+    to the healthy endpoint with the fewest generations running. Cancelling
+    a waiting or running generation (e.g. when its client disconnects)
+    gives its place back at once.
+    """
+
+    def __init__(self, base_urls: Optional[List[str]] = None,
+                 max_concurrency: int = settings.OLLAMA_MAX_CONCURRENCY,
+                 max_queue: int = settings.OLLAMA_MAX_QUEUE,
+                 queue_timeout: float = settings.OLLAMA_QUEUE_TIMEOUT):
+        self.clients = [OllamaClient(url, max_concurrency=max_concurrency) for url in base_urls or configured_urls()]
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._active: Dict[OllamaClient, int] = {client: 0 for client in self.clients}
+        # [priority, arrival, future] heap of waiting generations
+        self._waiters: List[list] = []
+        self._arrival = itertools.count()
+        # Moving average of how long a generation holds its slot, for Retry-After
+        self._average_seconds = 1.0
+
+    async def start(self) -> None:
+        await asyncio.gather(*(client.start() for client in self.clients))
+
+    async def close(self) -> None:
+        await asyncio.gather(*(client.close() for client in self.clients))
+
+    @property
+    def healthy(self) -> bool:
+        return any(client.healthy for client in self.clients)
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    @property
+    def running(self) -> int:
+        return sum(self._active.values())
+
+    def status(self) -> List[dict]:
+        return [
+            {"url": client.base_url, "healthy": client.healthy, "error": client.last_error,
+             "running": self._active[client]}
+            for client in self.clients
+        ]
+
+    def retry_after(self) -> int:
+        """Seconds until a new generation would likely get a slot."""
+        capacity = self.max_concurrency * max(1, sum(client.healthy for client in self.clients))
+        return max(1, math.ceil(self._average_seconds * (self.queued + 1) / capacity))
+
+    def check_admission(self) -> None:
+        """Raise at once if a generation submitted now would be turned away."""
+        if not self.healthy:
+            LLM_REJECTED.labels("unavailable").inc()
+            raise OllamaConnectionError(self.clients[0].last_error)
+        if self._free_client() is None and self.queued >= self.max_queue:
+            LLM_REJECTED.labels("queue_full").inc()
+            raise OllamaBusyError(
+                f"The server is busy: {self.queued} requests are already waiting. "
+                f"Please retry in {self.retry_after()} s.",
+                queued=self.queued, retry_after=self.retry_after(),
+            )
+
+    def _free_client(self) -> Optional[OllamaClient]:
+        free = [client for client in self.clients if self._active[client] < self.max_concurrency]
+        # With every endpoint down, hand out a slot anyway so the call fails fast
+        candidates = [client for client in free if client.healthy] or (free if not self.healthy else [])
+        return min(candidates, key=lambda client: self._active[client], default=None)
+
+    def _dispatch(self) -> None:
+        while self._waiters:
+            client = self._free_client()
+            if client is None:
+                break
+            _, _, future = heapq.heappop(self._waiters)
+            self._active[client] += 1
+            future.set_result(client)
+        LLM_QUEUE_LENGTH.set(self.queued)
+
+    def _release(self, client: OllamaClient, seconds: Optional[float] = None) -> None:
+        self._active[client] -= 1
+        if seconds is not None:
+            self._average_seconds += 0.2 * (seconds - self._average_seconds)
+        self._dispatch()
+
+    async def _acquire(self, priority: int) -> OllamaClient:
+        self.check_admission()
+        client = None if self._waiters else self._free_client()
+        if client is not None:
+            self._active[client] += 1
+            observe("llm_queue_wait", 0.0)
+            return client
+
+        started = time.perf_counter()
+        entry = [priority, next(self._arrival), asyncio.get_running_loop().create_future()]
+        heapq.heappush(self._waiters, entry)
+        LLM_QUEUE_LENGTH.set(self.queued)
+        try:
+            return await asyncio.wait_for(asyncio.shield(entry[2]), self.queue_timeout)
+        except (asyncio.CancelledError, asyncio.TimeoutError) as e:
+            future = entry[2]
+            if future.done():
+                # Granted a slot just as the wait ended; pass it on
+                self._release(future.result())
+            else:
+                future.cancel()
+                self._waiters.remove(entry)
+                heapq.heapify(self._waiters)
+                LLM_QUEUE_LENGTH.set(self.queued)
+            if isinstance(e, asyncio.TimeoutError):
+                LLM_REJECTED.labels("queue_timeout").inc()
+                raise OllamaBusyError(
+                    f"Timed out after {self.queue_timeout:g} s waiting for the model. "
+                    f"Please retry in {self.retry_after()} s.",
+                    queued=self.queued, retry_after=self.retry_after(),
+                ) from None
+            raise
+        finally:
+            observe("llm_queue_wait", time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def slot(self, priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[OllamaClient]:
+        """Wait for a generation slot and yield the client of its endpoint."""
+        client = await self._acquire(priority)
+        started = time.perf_counter()
+        try:
+            yield client
+        finally:
+            self._release(client, time.perf_counter() - started)
+
+
+llm_scheduler = LLMScheduler()
@@ -0,0 +1,71 @@
+import logging
+import time
+from contextlib import contextmanager
+
+from prometheus_client import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+# Chat stages: embed_query, vector_search, lexical_search, rerank,
+# context_build, llm_queue_wait (waiting for an Ollama slot),
+# ollama_prompt_eval, ollama_generation, and chat or chat_stream (the whole
+# request, until the last event is sent). Ingest stages: ingest_parse,
+# ingest_export, ingest_embed, ingest_index and ingest_file (the whole file).
+STAGE_SECONDS = Histogram(
+    "rag_stage_seconds",
+    "Time spent in each stage of answering a question or ingesting a file.",
+    ["stage"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300),
+)
+OLLAMA_TOKENS = Counter(
+    "rag_ollama_tokens_total",
+    "Tokens Ollama evaluated, by phase.",
+    ["phase"],
+)
+ANSWER_CACHE_REQUESTS = Counter(
+    "rag_answer_cache_requests_total",
+    "Answer cache lookups, by result.",
+    ["result"],
+)
+LLM_QUEUE_LENGTH = Gauge(
+    "rag_llm_queue_length",
+    "Generations waiting for an Ollama slot.",
+)
+LLM_REJECTED = Counter(
+    "rag_llm_rejected_total",
+    "Generations turned away by the scheduler, by reason.",
+    ["reason"],
+)
+QUERY_BATCH_SIZE = Histogram(
+    "rag_query_batch_size",
+    "Number of chat queries embedded and searched together.",
+    buckets=(1, 2, 4, 8, 16, 32, 64, 128),
+)
+
+
+def observe(stage: str, seconds: float) -> None:
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    logger.debug("%s took %.1f ms", stage, seconds * 1000)
+
+
+@contextmanager
+def timed(stage: str):
+    """Record the duration of the block as a span of the given stage."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(stage, time.perf_counter() - started)
+
+
+def observe_ollama(data: dict) -> None:
+    """Record the prompt-eval and generation timings of an Ollama response.
+
+    Ollama reports its durations in nanoseconds in the final response object.
+    """
+    if "prompt_eval_duration" in data:
+        observe("ollama_prompt_eval", data["prompt_eval_duration"] / 1e9)
+        OLLAMA_TOKENS.labels("prompt_eval").inc(data.get("prompt_eval_count", 0))
+    if "eval_duration" in data:
+        observe("ollama_generation", data["eval_duration"] / 1e9)
+        OLLAMA_TOKENS.labels("generation").inc(data.get("eval_count", 0))
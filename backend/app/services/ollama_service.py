@@ -1,17 +1,24 @@
-import requests
+import asyncio
+import json
+import logging
 import subprocess
-from utils.ollama_errors import check_ollama_health
+import time
+from typing import AsyncIterator, Optional
+
+import httpx
+from core.config import settings
+from utils.ollama_errors import OllamaConnectionError
 import signal
 
 
-OLLAMA_URL = "http://localhost:11434/api/generate"
 ollama_process = None  # Global variable to track the Ollama process
 
 def start_ollama_server():
     """Start the Ollama server."""
     global ollama_process
     try:
-        ollama_process = subprocess.Popen(["ollama", "serve"], stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        # Nothing reads its output, so don't let a full pipe stall it
+        ollama_process = subprocess.Popen(["ollama", "serve"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
         print("Ollama server started.")
     except Exception as e:
         raise RuntimeError(f"Failed to start Ollama server: {str(e)}")
@@ -26,3 +33,130 @@ def stop_ollama_server():
             print("Ollama server stopped.")
         except Exception as e:
             raise RuntimeError(f"Failed to stop Ollama server: {str(e)}")
+
+
+class OllamaClient:
+    """Long-lived async client for one Ollama endpoint.
+
+    Connections are pooled and kept alive, and a background task keeps a
+    cached health status that the request path reads instead of probing the
+    server on every call. How many generations run at once is up to the
+    LLMScheduler; max_concurrency only sizes the connection pool.
+    """
+
+    def __init__(self, base_url: str = settings.OLLAMA_BASE_URL,
+                 max_concurrency: int = settings.OLLAMA_MAX_CONCURRENCY,
+                 timeout: float = settings.OLLAMA_TIMEOUT,
+                 connect_timeout: float = settings.OLLAMA_CONNECT_TIMEOUT,
+                 health_interval: float = settings.OLLAMA_HEALTH_INTERVAL):
+        self.base_url = base_url
+        self.max_concurrency = max_concurrency
+        self.timeout = timeout
+        self.connect_timeout = connect_timeout
+        self.health_interval = health_interval
+        self.healthy = False
+        self.last_error: Optional[str] = "Ollama health has not been checked yet."
+        self.last_checked: Optional[float] = None
+        self._client: Optional[httpx.AsyncClient] = None
+        self._health_task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """Open the connection pool and start the health monitor."""
+        self._client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=httpx.Timeout(self.timeout, connect=self.connect_timeout),
+            limits=httpx.Limits(
+                max_connections=self.max_concurrency + 1,  # one spare for health checks
+                max_keepalive_connections=self.max_concurrency + 1,
+            ),
+        )
+        await self.check_health()
+        self._health_task = asyncio.create_task(self._monitor_health())
+
+    async def close(self) -> None:
+        if self._health_task:
+            self._health_task.cancel()
+            self._health_task = None
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    async def check_health(self) -> bool:
+        try:
+            response = await self._client.get("/api/tags", timeout=self.connect_timeout)
+            response.raise_for_status()
+            self._mark_healthy()
+        except Exception as e:
+            self._mark_unhealthy(e)
+        self.last_checked = time.time()
+        return self.healthy
+
+    async def _monitor_health(self) -> None:
+        while True:
+            # Poll faster while the server is down so recovery is noticed quickly
+            await asyncio.sleep(self.health_interval if self.healthy else min(1.0, self.health_interval))
+            await self.check_health()
+
+    def _mark_healthy(self) -> None:
+        if not self.healthy:
+            logging.info(f"Ollama at {self.base_url} is reachable.")
+        self.healthy = True
+        self.last_error = None
+
+    def _mark_unhealthy(self, e: Exception) -> None:
+        if self.healthy:
+            logging.warning(f"Ollama at {self.base_url} is unreachable: {e}")
+        self.healthy = False
+        self.last_error = "Could not connect to Ollama server. Please ensure Ollama is installed and running."
+
+    def ensure_healthy(self) -> None:
+        """Fail fast with the cached health status."""
+        if self._client is None:
+            raise OllamaConnectionError("Ollama client is not started.")
+        if not self.healthy:
+            raise OllamaConnectionError(self.last_error)
+
+    @staticmethod
+    async def _raise_for_error(response: httpx.Response) -> None:
+        if response.status_code >= 400:
+            body = (await response.aread()).decode("utf-8", errors="replace")
+            try:
+                message = json.loads(body).get("error") or body
+            except ValueError:
+                message = body
+            raise RuntimeError(f"Ollama returned {response.status_code}: {message}")
+
+    async def generate(self, prompt: str, model: str = settings.OLLAMA_MODEL) -> dict:
+        """Run a non-streaming generation and return Ollama's final response object."""
+        self.ensure_healthy()
+        try:
+            response = await self._client.post(
+                "/api/generate", json={"model": model, "prompt": prompt, "stream": False}
+            )
+        except httpx.ConnectError as e:
+            self._mark_unhealthy(e)
+            raise
+        await self._raise_for_error(response)
+        return response.json()
+
+    async def stream(self, prompt: str, model: str = settings.OLLAMA_MODEL) -> AsyncIterator[dict]:
+        """Yield Ollama's streamed response objects as they arrive."""
+        self.ensure_healthy()
+        try:
+            async with self._client.stream(
+                "POST", "/api/generate", json={"model": model, "prompt": prompt, "stream": True}
+            ) as response:
+                await self._raise_for_error(response)
+                # Ollama streams one JSON object per line
+                async for line in response.aiter_lines():
+                    if not line:
+                        continue
+                    data = json.loads(line)
+                    if data.get("error"):
+                        raise RuntimeError(data["error"])
+                    yield data
+                    if data.get("done"):
+                        break
+        except httpx.ConnectError as e:
+            self._mark_unhealthy(e)
+            raise
@@ -0,0 +1,104 @@
+import logging
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from core.config import settings
+from services.embedding_service import embedding_service
+from services.metrics import QUERY_BATCH_SIZE, timed
+
+
+class _Query:
+    __slots__ = ("processor", "query", "k", "future")
+
+    def __init__(self, processor, query: str, k: int):
+        self.processor = processor
+        self.query = query
+        self.k = k
+        self.future: Future = Future()
+
+
+class QueryBatcher:
+    """Embeds and searches concurrent chat queries together.
+
+    A single worker thread takes every query waiting when it becomes free
+    (up to max_batch) and encodes them in one forward pass. Each
+    collection's queries are then searched and reranked together on a
+    thread pool, so a collection held by its writer only delays its own
+    queries, and each query's future resolves with its (embedding, hits).
+    Queries arriving while a batch is embedded form the next one. A lone
+    query on an idle server is dispatched at once; only while the previous
+    batch had company does the worker wait up to window_ms for more to join.
+    """
+
+    def __init__(self, max_batch: int = settings.QUERY_BATCH_MAX,
+                 window_ms: float = settings.QUERY_BATCH_WINDOW_MS):
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000
+        self._queue: "queue.Queue[_Query]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._searches = ThreadPoolExecutor(max_workers=max(1, settings.MAX_LOADED_COLLECTIONS),
+                                            thread_name_prefix="query-search")
+
+    def submit(self, processor, query: str, k: int) -> Future:
+        """Queue a query against a DocumentProcessor; the future yields (embedding, hits)."""
+        item = _Query(processor, query, k)
+        self._queue.put(item)
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+                self._thread.start()
+        return item.future
+
+    def _run(self) -> None:
+        under_load = False
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.perf_counter() + (self.window if under_load else 0)
+            while len(batch) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    batch.append(self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            under_load = len(batch) > 1
+            # Drop queries whose requests have gone away
+            batch = [item for item in batch if item.future.set_running_or_notify_cancel()]
+            if batch:
+                try:
+                    self._process(batch)
+                except Exception as e:
+                    logging.exception("Query batch failed")
+                    for item in batch:
+                        if not item.future.done():
+                            item.future.set_exception(e)
+
+    def _process(self, batch: List[_Query]) -> None:
+        QUERY_BATCH_SIZE.observe(len(batch))
+        with timed("embed_query"):
+            vectors = embedding_service.embed([item.query for item in batch])
+
+        groups: Dict[int, List[int]] = {}
+        for i, item in enumerate(batch):
+            groups.setdefault(id(item.processor), []).append(i)
+        for indices in groups.values():
+            self._searches.submit(self._search, [batch[i] for i in indices], vectors[indices])
+
+    @staticmethod
+    def _search(items: List[_Query], vectors) -> None:
+        """Search one collection for its queries in the batch and resolve their futures."""
+        try:
+            results = items[0].processor.hybrid_search_many(
+                [item.query for item in items], max(item.k for item in items), vectors=vectors)
+        except Exception as e:
+            for item in items:
+                item.future.set_exception(e)
+            return
+        for item, vector, hits in zip(items, vectors, results):
+            item.future.set_result((vector, hits[:item.k]))
+
+
+query_batcher = QueryBatcher()
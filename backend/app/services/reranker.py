@@ -0,0 +1,72 @@
+import logging
+import threading
+import time
+from typing import List, Optional, Tuple
+
+from langchain.schema import Document
+from core.config import settings
+
+
+class Reranker:
+    """Local cross-encoder that re-orders retrieval candidates.
+
+    Candidates are scored in small batches until the latency budget runs
+    out; anything not scored by then keeps its original order after the
+    scored ones. The model is loaded on first use or by load().
+    """
+
+    def __init__(self, model_name: str = settings.RERANK_MODEL,
+                 budget_ms: float = settings.RERANK_BUDGET_MS,
+                 batch_size: int = settings.RERANK_BATCH_SIZE):
+        self.model_name = model_name
+        self.budget_ms = budget_ms
+        self.batch_size = batch_size
+        self._model = None
+        self._load_lock = threading.Lock()
+
+    def load(self):
+        """Load the cross-encoder if needed and return it."""
+        with self._load_lock:
+            if self._model is None:
+                from sentence_transformers import CrossEncoder
+
+                self._model = CrossEncoder(self.model_name)
+        return self._model
+
+    @property
+    def model(self):
+        return self._model or self.load()
+
+    def rerank(self, query: str, candidates: List[Tuple[str, Document, float]]) -> List[Tuple[str, Document, float]]:
+        return self.rerank_many([query], [candidates])[0]
+
+    def rerank_many(self, queries: List[str], candidate_lists: List[List[Tuple[str, Document, float]]]
+                    ) -> List[List[Tuple[str, Document, float]]]:
+        """rerank() for several queries, scoring their (query, chunk) pairs together.
+
+        Pairs are taken rank by rank across the queries and share one budget,
+        so when it runs out every query has had its best candidates scored.
+        """
+        deadline = time.perf_counter() + self.budget_ms / 1000
+        depth = max((len(candidates) for candidates in candidate_lists), default=0)
+        pairs = [(i, rank) for rank in range(depth)
+                 for i, candidates in enumerate(candidate_lists) if rank < len(candidates)]
+        scores: List[List[float]] = [[] for _ in candidate_lists]
+        for start in range(0, len(pairs), self.batch_size):
+            if time.perf_counter() >= deadline:
+                logging.info(f"Rerank budget spent after {start} of {len(pairs)} candidates.")
+                break
+            batch = pairs[start:start + self.batch_size]
+            predicted = self.model.predict([(queries[i], candidate_lists[i][rank][1].page_content)
+                                            for i, rank in batch])
+            for (i, _), score in zip(batch, predicted):
+                scores[i].append(float(score))
+
+        results = []
+        for candidates, query_scores in zip(candidate_lists, scores):
+            scored = [(doc_id, doc, score) for (doc_id, doc, _), score in zip(candidates, query_scores)]
+            scored.sort(key=lambda hit: hit[2], reverse=True)
+            results.append(scored + candidates[len(scored):])
+        return results
+
+reranker: Optional[Reranker] = Reranker() if settings.RERANK_MODEL else None
@@ -0,0 +1,382 @@
+import faiss
+import logging
+import numpy as np
+import os
+import pickle
+import time
+from typing import List, NamedTuple, Optional, Sequence, Set, Tuple
+
+from langchain.schema import Document
+from core.config import settings
+from services.chunk_store import ChunkStore
+
+INDEX_TYPES = ("flat", "hnsw", "ivf")
+QUANTIZATIONS = ("none", "fp16", "sq8", "pq")
+
+
+def index_description(index_type: str, quantization: str) -> str:
+    """faiss.index_factory description for an index type and vector encoding."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown vector index type {index_type!r}, expected one of {INDEX_TYPES}")
+    if quantization not in QUANTIZATIONS:
+        raise ValueError(f"Unknown vector quantization {quantization!r}, expected one of {QUANTIZATIONS}")
+
+    encoding = {"none": "Flat", "fp16": "SQfp16", "sq8": "SQ8", "pq": f"PQ{settings.VECTOR_INDEX_PQ_M}"}[quantization]
+    if index_type == "hnsw":
+        hnsw = f"HNSW{settings.VECTOR_INDEX_HNSW_M}"
+        return hnsw if quantization == "none" else f"{hnsw}_{encoding}"
+    if index_type == "ivf":
+        return f"IVF{settings.VECTOR_INDEX_IVF_NLIST},{encoding}"
+    return encoding
+
+
+class RebuiltIndex(NamedTuple):
+    """A freshly built index with the live chunks relabelled 0..n-1."""
+    index: object
+    docstore: ChunkStore
+    exact: Optional[np.ndarray]
+    staging: bool
+
+
+class VectorStore:
+    """FAISS index with stable int64 labels mapped to docstore ids.
+
+    Vectors live in an ``IndexIDMap2`` (IVF indexes take ids natively) so a
+    chunk can be removed with ``remove_ids`` without touching, re-embedding
+    or renumbering the others. HNSW cannot remove vectors, so its deletes are
+    tombstoned and searches pass FAISS a selector that skips them. Once too many labels belong to deleted chunks, the index is
+    rebuilt with the live chunks relabelled from 0, which also compacts the
+    docstore rows and the rescoring vectors.
+
+    Index types that need training (IVF, PQ, SQ8) start out as an exact flat
+    index and are trained and converted once enough vectors have been added.
+
+    Chunks are kept in a columnar ChunkStore whose rows are the FAISS labels.
+    With a compressed encoding (fp16, sq8, pq) and rescore > 0, the float32
+    vectors are kept aside as well, and the rescore * k best approximate hits
+    are re-ranked by their exact distance. That copy is as large as an
+    uncompressed index, so it cancels the memory quantization saves unless it
+    is memory-mapped from a saved store: then only the rows re-ranked are
+    paged in, as reclaimable page cache. Vectors added since the last save
+    are kept in a separate in-memory buffer, so the mapped rows are never
+    copied.
+    """
+
+    INDEX_FILE = "index.faiss"
+    DOCSTORE_FILE = "docstore.pkl"
+    VECTORS_FILE = "vectors.npy"
+    # Rebuild once this share of the labels handed out belong to deleted chunks
+    MAX_DELETED_RATIO = 0.2
+
+    def __init__(self, dimension: int, index_type: Optional[str] = None,
+                 quantization: Optional[str] = None, rescore: Optional[int] = None):
+        self.dimension = dimension
+        self.index_type = index_type or settings.VECTOR_INDEX_TYPE
+        self.quantization = quantization or settings.VECTOR_INDEX_QUANTIZATION
+        self.description = index_description(self.index_type, self.quantization)
+        # Training-free targets are built directly, the others are staged
+        self.staging = not faiss.index_factory(dimension, self.description).is_trained
+        self.index = faiss.IndexIDMap2(faiss.IndexFlatL2(dimension)) if self.staging else self._new_index()
+        # Chunk text and metadata, in rows numbered by FAISS label
+        self.docstore = ChunkStore()
+        self.deleted: Set[int] = set()
+        self._deleted_params = None
+        self.next_label = 0
+        self.rescore = settings.VECTOR_INDEX_RESCORE if rescore is None else rescore
+        # float32 vectors by label, kept for rescoring a compressed index:
+        # exact holds the first labels (memory-mapped once saved), and
+        # exact_added those added since, with spare capacity past next_label
+        self.exact: Optional[np.ndarray] = None
+        self.exact_added: Optional[np.ndarray] = None
+        if self.quantization != "none" and self.rescore > 0:
+            self.exact = np.empty((0, dimension), dtype="float32")
+            self.exact_added = np.empty((0, dimension), dtype="float32")
+
+    def __len__(self) -> int:
+        return len(self.docstore)
+
+    @property
+    def supports_remove(self) -> bool:
+        return self.staging or self.index_type != "hnsw"
+
+    @property
+    def train_min(self) -> int:
+        """Number of vectors to collect before training the target index."""
+        if settings.VECTOR_INDEX_TRAIN_MIN:
+            return settings.VECTOR_INDEX_TRAIN_MIN
+        # faiss wants ~39 training points per centroid
+        minimum = 1000
+        if self.index_type == "ivf":
+            minimum = max(minimum, 39 * settings.VECTOR_INDEX_IVF_NLIST)
+        if self.quantization == "pq":
+            minimum = max(minimum, 39 * 256)
+        return minimum
+
+    def _new_index(self):
+        index = faiss.index_factory(self.dimension, self.description)
+        if self.index_type == "hnsw":
+            faiss.downcast_index(index).hnsw.efConstruction = settings.VECTOR_INDEX_HNSW_EF_CONSTRUCTION
+        if self.index_type != "ivf":
+            index = faiss.IndexIDMap2(index)
+        self._set_search_params(index)
+        return index
+
+    def _set_search_params(self, index) -> None:
+        params = faiss.ParameterSpace()
+        if self.index_type == "hnsw":
+            params.set_index_parameter(index, "efSearch", settings.VECTOR_INDEX_HNSW_EF_SEARCH)
+        elif self.index_type == "ivf":
+            params.set_index_parameter(index, "nprobe", settings.VECTOR_INDEX_IVF_NPROBE)
+
+    def _export(self) -> Tuple[np.ndarray, np.ndarray]:
+        """Return (vectors, labels) of the live chunks, in label order."""
+        labels = np.array(sorted(self.docstore.rows.values()), dtype="int64")
+        if self.exact is not None:
+            # Exact, where reconstructing from a compressed index would not be
+            return self.exact_vectors(labels), labels
+        index = self.index
+        if not isinstance(index, faiss.IndexIDMap2):
+            # IVF keeps the ids in its lists; look them up on a copy, as
+            # queries may be searching the original
+            index = faiss.clone_index(index)
+            faiss.extract_index_ivf(index).set_direct_map_type(faiss.DirectMap.Hashtable)
+        return index.reconstruct_batch(labels), labels
+
+    def exact_vectors(self, labels: np.ndarray) -> np.ndarray:
+        """float32 vectors of the given labels, from exact or exact_added."""
+        saved = len(self.exact)
+        if not len(labels) or labels.max() < saved:
+            return self.exact[labels]
+        vectors = np.empty((len(labels), self.dimension), dtype="float32")
+        in_saved = labels < saved
+        vectors[in_saved] = self.exact[labels[in_saved]]
+        vectors[~in_saved] = self.exact_added[labels[~in_saved] - saved]
+        return vectors
+
+    @property
+    def exact_nbytes(self) -> int:
+        """Bytes of float32 vectors kept for rescoring, mapped or not."""
+        if self.exact is None:
+            return 0
+        return self.exact.nbytes + (self.next_label - len(self.exact)) * self.dimension * 4
+
+    @property
+    def needs_rebuild(self) -> bool:
+        """True once the staged index has enough vectors to train the target
+        one, or too many labels belong to deleted chunks."""
+        if self.staging and len(self.docstore) >= self.train_min:
+            return True
+        return self.next_label - len(self.docstore) > self.MAX_DELETED_RATIO * self.next_label
+
+    def build_index(self) -> RebuiltIndex:
+        """Build the target index over the live chunks, training it if needed.
+
+        Only reads the store, so searches can go on meanwhile; install() swaps
+        the result in, provided nothing was added or deleted in between.
+        """
+        started = time.perf_counter()
+        vectors, labels = self._export()
+        staging = False
+        if self.exact is None and not self.staging:
+            # The vectors were reconstructed from the compressed codes;
+            # retraining on them would lose accuracy with every rebuild,
+            # whereas the trained parameters encode them back to the same codes
+            index = faiss.clone_index(self.index)
+            index.reset()
+            self._set_search_params(index)
+        else:
+            index = self._new_index()
+        if not index.is_trained:
+            if len(labels) < self.train_min:
+                # Too few vectors left to train on; stage them again
+                index = faiss.IndexIDMap2(faiss.IndexFlatL2(self.dimension))
+                staging = True
+            else:
+                index.train(vectors)
+        index.add_with_ids(vectors, np.arange(len(labels), dtype="int64"))
+        logging.info(
+            f"Built {'flat' if staging else self.description} index over {len(labels)} vectors "
+            f"in {time.perf_counter() - started:.2f}s."
+        )
+        return RebuiltIndex(index, self.docstore.take(labels),
+                            vectors if self.exact is not None else None, staging)
+
+    def install(self, rebuilt: RebuiltIndex) -> None:
+        """Replace the index and docstore with those returned by build_index()."""
+        self.index = rebuilt.index
+        self.docstore = rebuilt.docstore
+        self.exact = rebuilt.exact
+        if rebuilt.exact is not None:
+            self.exact_added = np.empty((0, self.dimension), dtype="float32")
+        self.staging = rebuilt.staging
+        self.next_label = len(rebuilt.docstore)
+        self.deleted.clear()
+        self._deleted_params = None
+
+    def _rebuild(self) -> None:
+        self.install(self.build_index())
+
+    def add(self, ids: Sequence[str], documents: Sequence[Document], vectors, rebuild: bool = True) -> None:
+        """Add documents and their embeddings under the given docstore ids.
+
+        With rebuild=False the caller checks needs_rebuild and rebuilds the
+        index itself.
+        """
+        vectors = np.asarray(vectors, dtype="float32").reshape(len(ids), self.dimension)
+        labels = np.arange(self.next_label, self.next_label + len(ids), dtype="int64")
+        self.index.add_with_ids(vectors, labels)
+        self.docstore.add(ids, labels.tolist(), documents)
+        if self.exact is not None:
+            start = self.next_label - len(self.exact)
+            self._reserve_exact_added(start + len(ids))
+            self.exact_added[start:start + len(ids)] = vectors
+        self.next_label += len(ids)
+
+        if rebuild and self.needs_rebuild:
+            self._rebuild()
+
+    def _reserve_exact_added(self, size: int) -> None:
+        """Make room for size rows in exact_added, growing it geometrically."""
+        if size <= len(self.exact_added):
+            return
+        used = self.next_label - len(self.exact)
+        grown = np.empty((max(size, 2 * len(self.exact_added)), self.dimension), dtype="float32")
+        grown[:used] = self.exact_added[:used]
+        self.exact_added = grown
+
+    def delete(self, ids: Sequence[str], rebuild: bool = True) -> int:
+        """Remove the given docstore ids and their vectors. Returns the count removed."""
+        labels = []
+        for doc_id in ids:
+            label = self.docstore.delete(doc_id)
+            if label is not None:
+                labels.append(label)
+
+        if not labels:
+            return 0
+        if self.supports_remove:
+            self.index.remove_ids(np.array(labels, dtype="int64"))
+        else:
+            self.deleted.update(labels)
+            self._deleted_params = None
+        if rebuild and self.needs_rebuild:
+            self._rebuild()
+        return len(labels)
+
+    def search(self, vector, k: int) -> List[Tuple[str, Document, float]]:
+        """Return (docstore id, document, L2 distance) for the k nearest chunks."""
+        return self.search_many(vector, k)[0]
+
+    def search_many(self, vectors, k: int) -> List[List[Tuple[str, Document, float]]]:
+        """search() for each row of vectors, as a single FAISS query."""
+        queries = np.asarray(vectors, dtype="float32").reshape(-1, self.dimension)
+        if not self.docstore:
+            return [[] for _ in range(len(queries))]
+        rescoring = self.exact is not None and not self.staging
+        wanted = k * self.rescore if rescoring else k
+        params = self._skip_deleted() if self.deleted else None
+        distances, labels = self.index.search(queries, min(wanted, self.index.ntotal), params=params)
+
+        results = []
+        for query, row_distances, row_labels in zip(queries, distances, labels):
+            # FAISS pads with -1 when fewer vectors match
+            live = row_labels >= 0
+            row_labels, row_distances = row_labels[live], row_distances[live]
+            if rescoring and len(row_labels):
+                exact = ((self.exact_vectors(row_labels) - query) ** 2).sum(axis=1)
+                best = np.argsort(exact, kind="stable")[:k]
+                row_labels, row_distances = row_labels[best], exact[best]
+            results.append([
+                (self.docstore.id_at(label), self.docstore.document(label), distance)
+                for label, distance in zip(row_labels[:k].tolist(), row_distances[:k].tolist())
+            ])
+        return results
+
+    def _skip_deleted(self):
+        """HNSW search parameters excluding the tombstoned labels, built once per set of deletes."""
+        cached = self._deleted_params
+        if cached is None:
+            excluded = faiss.IDSelectorBatch(np.fromiter(self.deleted, dtype="int64", count=len(self.deleted)))
+            selector = faiss.IDSelectorNot(excluded)
+            params = faiss.SearchParametersHNSW(sel=selector, efSearch=settings.VECTOR_INDEX_HNSW_EF_SEARCH)
+            # The selectors must outlive the parameters that point to them
+            cached = self._deleted_params = (params, selector, excluded)
+        return cached[0]
+
+    def save(self, folder_path: str) -> None:
+        """Write the index and docstore into folder_path."""
+        os.makedirs(folder_path, exist_ok=True)
+        faiss.write_index(self.index, os.path.join(folder_path, self.INDEX_FILE))
+        state = {
+            "docstore": self.docstore,
+            "next_label": self.next_label,
+            "deleted": self.deleted,
+            "index_type": self.index_type,
+            "quantization": self.quantization,
+            "staging": self.staging,
+            "rescore": self.rescore,
+        }
+        with open(os.path.join(folder_path, self.DOCSTORE_FILE), "wb") as f:
+            pickle.dump(state, f)
+        if self.exact is not None:
+            vectors_path = os.path.join(folder_path, self.VECTORS_FILE)
+            # Written in two parts, so the saved rows are not copied into memory
+            saved = np.lib.format.open_memmap(vectors_path, mode="w+", dtype="float32",
+                                              shape=(self.next_label, self.dimension))
+            saved[:len(self.exact)] = self.exact
+            saved[len(self.exact):] = self.exact_added[:self.next_label - len(self.exact)]
+            saved.flush()
+            del saved
+            # Read back from the page cache from now on; the mapping stays
+            # valid after the snapshot is renamed or pruned
+            self.exact = np.load(vectors_path, mmap_mode="r")
+            self.exact_added = np.empty((0, self.dimension), dtype="float32")
+
+    @classmethod
+    def load(cls, folder_path: str, mmap: bool = False) -> "VectorStore":
+        """Read a store written by save().
+
+        With mmap=True the index is memory-mapped read-only, so processes
+        loading the same snapshot share its pages instead of each holding a
+        private copy of the vectors.
+        """
+        index_path = os.path.join(folder_path, cls.INDEX_FILE)
+        index = None
+        if mmap:
+            try:
+                index = faiss.read_index(index_path, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError as e:
+                logging.warning(f"Could not memory-map {index_path}, loading it into memory: {e}")
+        if index is None:
+            index = faiss.read_index(index_path)
+
+        with open(os.path.join(folder_path, cls.DOCSTORE_FILE), "rb") as f:
+            state = pickle.load(f)
+
+        store = cls.__new__(cls)
+        store.dimension = index.d
+        store.index = index
+        store.index_type = state["index_type"]
+        store.quantization = state["quantization"]
+        store.description = index_description(store.index_type, store.quantization)
+        store.staging = state["staging"]
+        store.docstore = state["docstore"]
+        if not isinstance(store.docstore, ChunkStore):
+            # Snapshot written before the chunk store: a dict of Documents
+            store.docstore = ChunkStore.from_documents(state["id_to_label"], store.docstore)
+        store.deleted = state["deleted"]
+        store._deleted_params = None
+        store.next_label = state["next_label"]
+        store.rescore = state.get("rescore", 0)
+        vectors_path = os.path.join(folder_path, cls.VECTORS_FILE)
+        store.exact = np.load(vectors_path, mmap_mode="r") if os.path.exists(vectors_path) else None
+        store.exact_added = np.empty((0, store.dimension), dtype="float32") if store.exact is not None else None
+        if not store.staging:
+            store._set_search_params(store.index)
+
+        if (store.index_type, store.quantization) != (settings.VECTOR_INDEX_TYPE, settings.VECTOR_INDEX_QUANTIZATION):
+            logging.warning(
+                f"Vector store in {folder_path} uses a {store.index_type}/{store.quantization} index, which it "
+                f"keeps; the configured index only applies to stores created from scratch."
+            )
+        return store
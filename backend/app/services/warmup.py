@@ -0,0 +1,61 @@
+import asyncio
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi.concurrency import run_in_threadpool
+
+from core.config import settings
+from services.collection_manager import DEFAULT_COLLECTION, collection_manager
+from services.embedding_service import embedding_service
+from services.reranker import reranker
+from utils.context_builder import count_tokens
+
+
+class WarmUp:
+    """Loads the models and the default collection in the background.
+
+    Runs after startup so the app starts serving (and answering liveness
+    checks) at once; requests that arrive earlier load what they need on
+    first use. The readiness endpoint reports done once every step is.
+    """
+
+    def __init__(self):
+        self.done = False
+        self.error: Optional[str] = None
+        # step name -> seconds it took
+        self.loaded: Dict[str, float] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def _steps(self) -> List[Tuple[str, Callable[[], object]]]:
+        steps = [
+            ("embedding_model", embedding_service.load),
+            ("default_collection", lambda: collection_manager.get(DEFAULT_COLLECTION)),
+        ]
+        if reranker:
+            steps.append(("rerank_model", reranker.load))
+        if settings.CONTEXT_TOKENIZER:
+            steps.append(("tokenizer", lambda: count_tokens("")))
+        return steps
+
+    def start(self) -> None:
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self) -> None:
+        try:
+            for name, load in self._steps():
+                started = time.perf_counter()
+                await run_in_threadpool(load)
+                self.loaded[name] = round(time.perf_counter() - started, 3)
+            self.done = True
+            logging.info(f"Warm-up finished: {self.loaded}")
+        except Exception as e:
+            logging.exception("Warm-up failed")
+            self.error = str(e)
+
+    async def stop(self) -> None:
+        if self._task and not self._task.done():
+            self._task.cancel()
+
+
+warm_up = WarmUp()
@@ -0,0 +1,153 @@
+import logging
+import math
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Sequence, Set, Tuple
+
+from langchain.schema import Document
+from core.config import settings
+
+
+@lru_cache(maxsize=1)
+def _tokenizer():
+    from transformers import AutoTokenizer
+    return AutoTokenizer.from_pretrained(settings.CONTEXT_TOKENIZER)
+
+
+def count_tokens(text: str) -> int:
+    """Token count with CONTEXT_TOKENIZER, or a ~4 characters/token estimate."""
+    if settings.CONTEXT_TOKENIZER:
+        return len(_tokenizer().encode(text, add_special_tokens=False))
+    return math.ceil(len(text) / 4)
+
+
+def _shingles(text: str, size: int = 3) -> Set[Tuple[str, ...]]:
+    words = re.findall(r"\w+", text.lower())
+    return {tuple(words[i:i + size]) for i in range(max(1, len(words) - size + 1))}
+
+
+def _overlap(left: str, right: str, max_overlap: int) -> int:
+    """Length of the longest suffix of left that is a prefix of right."""
+    for size in range(min(len(left), len(right), max_overlap), 19, -1):
+        if left.endswith(right[:size]):
+            return size
+    return 0
+
+
+class _Block:
+    """A run of merged chunks from the same source page."""
+
+    def __init__(self, rank: int, doc: Document):
+        self.rank = rank
+        self.source = doc.metadata.get("source")
+        self.page = doc.metadata.get("page")
+        self.start = doc.metadata.get("start_index")
+        self.text = doc.page_content
+        self.chunks = 1
+
+    @property
+    def end(self) -> Optional[int]:
+        return None if self.start is None else self.start + len(self.text)
+
+    def merge(self, doc: Document) -> bool:
+        """Append doc if it overlaps or directly follows this block."""
+        if self.source is None or (doc.metadata.get("source"), doc.metadata.get("page")) != (self.source, self.page):
+            return False
+        start = doc.metadata.get("start_index")
+        if self.start is not None and start is not None:
+            if start > self.end:
+                return False
+            self.text += doc.page_content[self.end - start:]
+        else:
+            overlap = _overlap(self.text, doc.page_content, settings.CHUNK_OVERLAP * 2)
+            if not overlap:
+                return False
+            self.text += doc.page_content[overlap:]
+        self.chunks += 1
+        return True
+
+
+# Text kept from the best section however small the budget; a context
+# without any document text would only invite the model to guess
+MIN_TRIMMED_CHARS = 80
+
+
+def _trim_section(title: str, text: str, budget: int) -> Tuple[str, int]:
+    """Cut text until its section fits budget tokens; return (section, tokens)."""
+    available = budget - count_tokens(f"{title}\n\n\n\n")
+    while True:
+        section = f"{title}\n\n{text}\n\n"
+        tokens = count_tokens(section)
+        if tokens <= budget or len(text) <= MIN_TRIMMED_CHARS:
+            return section, tokens
+        keep = int(len(text) * available / max(1, count_tokens(text)))
+        text = text[:max(MIN_TRIMMED_CHARS, min(keep, len(text) - 1))]
+
+
+class Context:
+    def __init__(self, markdown: str, tokens: int, chunks_used: int, merged: int, dropped: int):
+        self.markdown = markdown
+        self.tokens = tokens
+        self.chunks_used = chunks_used
+        self.merged = merged
+        self.dropped = dropped
+
+
+def build_context(docs: Sequence[Document], token_budget: int = settings.CONTEXT_TOKEN_BUDGET,
+                  dedup_threshold: float = settings.CONTEXT_DEDUP_THRESHOLD) -> Context:
+    """Assemble ranked chunks into a Markdown context that fits the token budget.
+
+    Overlapping or adjacent chunks of the same source page are merged into
+    one section, near-duplicate sections are dropped, and sections are then
+    packed in rank order until the budget is used up.
+    """
+    # Merge in document order so neighbours meet, keeping each block's best rank
+    ordered = sorted(
+        enumerate(docs),
+        key=lambda item: (str(item[1].metadata.get("source")), item[1].metadata.get("page") or 0,
+                          item[1].metadata.get("start_index") or 0, item[0]),
+    )
+    blocks: List[_Block] = []
+    for rank, doc in ordered:
+        if blocks and blocks[-1].merge(doc):
+            blocks[-1].rank = min(blocks[-1].rank, rank)
+        else:
+            blocks.append(_Block(rank, doc))
+    blocks.sort(key=lambda block: block.rank)
+
+    kept, kept_shingles, dropped = [], [], 0
+    for block in blocks:
+        shingles = _shingles(block.text)
+        if any(len(shingles & other) / len(shingles | other) >= dedup_threshold for other in kept_shingles):
+            dropped += block.chunks
+            continue
+        kept.append(block)
+        kept_shingles.append(shingles)
+
+    header = "# Relevant Document Sections\n\n"
+    sections = [header]
+    used_tokens, chunks_used = count_tokens(header), 0
+    for block in kept:
+        title = f"## Section {len(sections)}"
+        if block.source:
+            title += f" ({os.path.basename(str(block.source))}, page {(block.page or 0) + 1})"
+        section = f"{title}\n\n{block.text}\n\n"
+        tokens = count_tokens(section)
+        if used_tokens + tokens > token_budget:
+            if len(sections) > 1:
+                dropped += block.chunks
+                continue
+            # Never return an empty context: cut the best section down to size
+            section, tokens = _trim_section(title, block.text, token_budget - used_tokens)
+        sections.append(section)
+        used_tokens += tokens
+        chunks_used += block.chunks
+    markdown_content = "".join(sections)
+
+    merged = sum(block.chunks - 1 for block in blocks)
+    logging.info(
+        f"Context: {used_tokens} tokens from {chunks_used} of {len(docs)} chunks "
+        f"({merged} merged, {dropped} dropped)."
+    )
+    return Context(markdown_content, used_tokens, chunks_used, merged, dropped)
@@ -1,114 +1,278 @@
-import base64
+import hashlib
 import json
 import os
 import re
+import tempfile
+from dataclasses import dataclass, field
 from fastapi import UploadFile, HTTPException
-from PyPDF2 import PdfReader
-import docx
-import fitz  # PyMuPDF
-import camelot.io as camelot
+# PyMuPDF, python-docx and the text splitter are imported where they are
+# used, so importing this module stays cheap at app startup.
+from langchain.schema import Document
+from typing import Dict, List, Optional, Tuple
+from core.config import settings
 
-FILES_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "files")  # Save files inside app/files
-os.makedirs(FILES_DIR, exist_ok=True)
 
-def save_file(file: UploadFile) -> str:
-    """Save an uploaded file to the server."""
-    file_path = os.path.join(FILES_DIR, str(file.filename))
+@dataclass
+class ExtractedPage:
+    """Content of one PDF page. Images are referenced by xref, not copied."""
+    number: int
+    text: str
+    tables: List[List[List[str]]] = field(default_factory=list)
+    images: List[int] = field(default_factory=list)
+
+
+@dataclass
+class ExtractedDocument:
+    """Per-page model of a PDF, produced by a single extraction pass."""
+    file_path: str
+    pages: List[ExtractedPage]
+
+    @property
+    def text(self) -> str:
+        return "\n".join(page.text for page in self.pages)
+
+    @property
+    def tables(self) -> List[List[List[str]]]:
+        return [table for page in self.pages for table in page.tables]
+
+    @property
+    def images(self) -> List[int]:
+        return [xref for page in self.pages for xref in page.images]
+
+    def to_documents(self) -> List[Document]:
+        """One Document per page, with the same metadata PyPDFLoader sets."""
+        return [
+            Document(page_content=page.text, metadata={"source": self.file_path, "page": page.number})
+            for page in self.pages
+        ]
+
+
+def check_upload_size(file: UploadFile, max_bytes: int = settings.UPLOAD_MAX_BYTES) -> None:
+    """Reject an upload whose declared size is over the limit."""
+    if max_bytes and file.size is not None and file.size > max_bytes:
+        raise HTTPException(
+            status_code=413,
+            detail=f"{file.filename} is larger than the {max_bytes} byte upload limit",
+        )
+
+def save_file(file: UploadFile, files_dir: str = settings.FILES_DIR,
+              max_bytes: int = settings.UPLOAD_MAX_BYTES) -> Tuple[str, str]:
+    """Save an uploaded file to the server and return its path and SHA-256 digest.
+
+    The upload is copied in UPLOAD_CHUNK_SIZE blocks and hashed as it is
+    written, so memory use does not grow with the file size. The file only
+    replaces an existing one of the same name once it is complete.
+    """
+    check_upload_size(file, max_bytes)
+    file_path = os.path.join(files_dir, os.path.basename(str(file.filename)))
+    tmp_path = None
     try:
-        with open(file_path, "wb") as buffer:
-            buffer.write(file.file.read())
-        return file_path
+        os.makedirs(files_dir, exist_ok=True)
+        digest, size = hashlib.sha256(), 0
+        with tempfile.NamedTemporaryFile(dir=files_dir, prefix=".upload-", suffix=".part", delete=False) as buffer:
+            tmp_path = buffer.name
+            for block in iter(lambda: file.file.read(settings.UPLOAD_CHUNK_SIZE), b""):
+                size += len(block)
+                if max_bytes and size > max_bytes:
+                    raise HTTPException(
+                        status_code=413,
+                        detail=f"{file.filename} is larger than the {max_bytes} byte upload limit",
+                    )
+                digest.update(block)
+                buffer.write(block)
+        os.replace(tmp_path, file_path)
+        tmp_path = None
+        return file_path, digest.hexdigest()
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error saving file: {str(e)}")
+    finally:
+        if tmp_path and os.path.exists(tmp_path):
+            os.remove(tmp_path)
 
-def extract_text_from_pdf(file_path: str) -> str:
-    """Extract text from a PDF file."""
-    try:
-        reader = PdfReader(file_path)
-        text = ""
-        for page in reader.pages:
-            text += page.extract_text()
-        return text
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading PDF: {str(e)}")
+# Drawings no thicker than this (in points) are rules rather than boxes
+RULE_MAX_THICKNESS = 2.0
+# Rules a page needs before it is searched for tables
+MIN_TABLE_RULES = 3
+# Boxes sharing a row or column a page needs, for tables drawn as shaded cells
+MIN_TABLE_CELLS = 3
+
+def has_ruling_lines(page) -> bool:
+    """True if the page draws what a table could be ruled with.
+
+    That is several horizontal or vertical rules, drawn as line segments or
+    thin rectangles, or several boxes lined up in a row or column like
+    shaded cells. A background or border rectangle on its own does not count.
+    """
+    rules = 0
+    rows: Dict[Tuple[int, int], int] = {}
+    columns: Dict[Tuple[int, int], int] = {}
+    for path in page.get_drawings():
+        for item in path["items"]:
+            if item[0] == "l":
+                width, height = abs(item[2].x - item[1].x), abs(item[2].y - item[1].y)
+            elif item[0] in ("re", "qu"):
+                rect = item[1] if item[0] == "re" else item[1].rect
+                width, height = rect.width, rect.height
+                if min(width, height) > RULE_MAX_THICKNESS:
+                    row, column = (round(rect.y0), round(rect.y1)), (round(rect.x0), round(rect.x1))
+                    rows[row] = rows.get(row, 0) + 1
+                    columns[column] = columns.get(column, 0) + 1
+                    continue
+            else:
+                continue
+            if min(width, height) <= RULE_MAX_THICKNESS < max(width, height):
+                rules += 1
+                if rules >= MIN_TABLE_RULES:
+                    return True
+    return any(count >= MIN_TABLE_CELLS for count in (*rows.values(), *columns.values()))
+
+def extract_pages(pdf_document, start: int = 0, stop: Optional[int] = None) -> List[ExtractedPage]:
+    """Extract text, tables and image references from pages [start, stop).
+
+    Table detection is skipped on pages without ruling lines when
+    PDF_TABLES_REQUIRE_RULINGS is set, since it is by far the slowest step.
+    """
+    pages = []
+    for number in range(start, pdf_document.page_count if stop is None else stop):
+        page = pdf_document[number]
+        tables = []
+        if not settings.PDF_TABLES_REQUIRE_RULINGS or has_ruling_lines(page):
+            tables = [
+                [["" if cell is None else str(cell) for cell in row] for row in table.extract()]
+                for table in page.find_tables().tables
+            ]
+        pages.append(ExtractedPage(
+            number=page.number,
+            text=page.get_text(),
+            tables=tables,
+            images=[img[0] for img in page.get_images(full=True)],
+        ))
+    return pages
+
+def pdf_page_count(file_path: str) -> int:
+    import fitz  # PyMuPDF
 
-def extract_text_from_docx(file_path: str) -> str:
-    """Extract text from a DOCX file."""
     try:
-        doc = docx.Document(file_path)
-        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
-        return text
+        with fitz.open(file_path) as pdf_document:
+            return pdf_document.page_count
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error reading DOCX: {str(e)}")
-    
+        raise RuntimeError(f"Error reading PDF: {str(e)}") from None
 
+def extract_pdf(file_path: str) -> ExtractedDocument:
+    """Extract text, tables and image references from a PDF in one pass."""
+    import fitz  # PyMuPDF
 
-def extract_images_from_pdf(file_path: str) -> list:
-    """Extract images from a PDF file."""
     try:
-        images = []
-        pdf_document = fitz.open(file_path)
-        for page_number in range(len(pdf_document)):
-            page = pdf_document[page_number]
-            image_list = page.get_images(full=True)
-            for img_index, img in enumerate(image_list):
-                xref = img[0]
-                base_image = pdf_document.extract_image(xref)
-                image_bytes = base_image["image"]
-                image_base64 = base64.b64encode(image_bytes).decode("utf-8")
-                images.append(image_base64)
-        return images
+        with fitz.open(file_path) as pdf_document:
+            return ExtractedDocument(file_path=file_path, pages=extract_pages(pdf_document))
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error extracting images: {str(e)}")
-    
+        raise RuntimeError(f"Error reading PDF: {str(e)}") from None
 
+def split_document(document: ExtractedDocument) -> List[Document]:
+    """Split an extracted PDF into chunks for the vector store."""
+    from langchain.text_splitter import RecursiveCharacterTextSplitter
+
+    text_splitter = RecursiveCharacterTextSplitter(
+        chunk_size=settings.CHUNK_SIZE,
+        chunk_overlap=settings.CHUNK_OVERLAP,
+        add_start_index=True,  # lets the context builder merge overlapping chunks
+    )
+    return text_splitter.split_documents(document.to_documents())
+
+def extract_text_from_docx(file_path: str) -> str:
+    """Extract text from a DOCX file."""
+    import docx
 
-def extract_tables_from_pdf(file_path: str) -> list:
-    """Extract tables from a PDF file."""
     try:
-        tables = camelot.read_pdf(file_path, pages="all")
-        extracted_tables = [table.df for table in tables]
-        return extracted_tables
+        doc = docx.Document(file_path)
+        text = "\n".join([paragraph.text for paragraph in doc.paragraphs])
+        return text
     except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error extracting tables: {str(e)}")
-    
+        raise RuntimeError(f"Error reading DOCX: {str(e)}") from None
+
 def process_pdf(file_path: str):
     """Process a PDF file to extract text, images, and tables."""
-    text = extract_text_from_pdf(file_path)
-    images = extract_images_from_pdf(file_path)
-    tables = extract_tables_from_pdf(file_path)
+    document = extract_pdf(file_path)
 
     # Combine extracted content
     context = {
-        "text": text,
-        "images": images,
-        "tables": tables
+        "text": document.text,
+        "images": document.images,
+        "tables": document.tables
     }
     return context
 
-def process_pdf_to_markdown(file_path: str) -> str:
-    """Convert a PDF file to Markdown format."""
-    context = process_pdf(file_path)  # Extract text, images, and tables
+def table_to_markdown(rows: List[List[str]]) -> str:
+    """Render table rows as a Markdown table, using the first row as header."""
+    if not rows:
+        return ""
+    width = max(len(row) for row in rows)
+    rows = [[re.sub(r"\s+", " ", cell).replace("|", "\\|") for cell in row] + [""] * (width - len(row))
+            for row in rows]
+    lines = ["| " + " | ".join(rows[0]) + " |", "|" + "---|" * width]
+    lines += ["| " + " | ".join(row) + " |" for row in rows[1:]]
+    return "\n".join(lines)
 
-    markdown_content = f"# Document Content\n\n{context['text']}\n\n"
+def render_markdown(document: ExtractedDocument) -> str:
+    """Render an extracted PDF as Markdown."""
+    markdown_content = f"# Document Content\n\n{document.text}\n\n"
 
     # Add tables to Markdown
     markdown_content += "## Tables\n\n"
-    for i, table in enumerate(context['tables']):
+    for i, table in enumerate(document.tables):
         markdown_content += f"### Table {i + 1}\n\n"
-        markdown_content += table.to_markdown(index=False) + "\n\n"
+        markdown_content += table_to_markdown(table) + "\n\n"
 
     # Add image placeholders to Markdown
     markdown_content += "## Images\n\n"
-    for i, image in enumerate(context['images']):
+    for i, _ in enumerate(document.images):
         markdown_content += f"![Image {i + 1}](image_{i + 1}.png)\n\n"
 
     return markdown_content
 
+def render_structured_json(document: ExtractedDocument) -> dict:
+    """Structured form of an extracted PDF, as read by process_json_for_embedding."""
+    return {
+        "text": [page.text for page in document.pages],
+        "tables": document.tables,
+        "images": [{"page": page.number, "xref": xref} for page in document.pages for xref in page.images],
+    }
+
+def process_pdf_to_markdown(file_path: str) -> str:
+    """Convert a PDF file to Markdown format."""
+    return render_markdown(extract_pdf(file_path))
+
+def parse_pdf_pages(file_path: str, start: int, stop: int) -> Tuple[List[ExtractedPage], List[Document]]:
+    """Extract pages [start, stop) of a PDF and split them into chunks.
+
+    Meant to run in a worker process, one call per page range; errors are
+    raised as RuntimeError, like the other readers. Chunks never span pages, so splitting a range at a time
+    gives the same chunks as splitting the whole document.
+    """
+    import fitz  # PyMuPDF
+
+    try:
+        with fitz.open(file_path) as pdf_document:
+            pages = extract_pages(pdf_document, start, stop)
+    except Exception as e:
+        raise RuntimeError(f"Error reading PDF: {str(e)}") from None
+    return pages, split_document(ExtractedDocument(file_path=file_path, pages=pages))
+
+def write_exports(document: ExtractedDocument, markdown_path: Optional[str] = None,
+                  json_path: Optional[str] = None) -> None:
+    """Write the Markdown and structured JSON exports of an extracted PDF."""
+    if markdown_path:
+        with open(markdown_path, "w", encoding="utf-8") as md_file:
+            md_file.write(render_markdown(document))
+    if json_path:
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(render_structured_json(document), f, indent=2)
+
 
 def pdf_to_structured_json(file_path: str, output_path: str = None) -> dict:
-    context = process_pdf(file_path)
-    context['tables'] = [table.to_dict(orient="records") for table in context['tables']]
+    context = render_structured_json(extract_pdf(file_path))
 
     if output_path:
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
@@ -116,4 +280,4 @@ def pdf_to_structured_json(file_path: str, output_path: str = None) -> dict:
             json.dump(context, f, indent=2)
         print(f"Structured JSON saved at: {output_path}")
 
-    return context
\ No newline at end of file
+    return context
@@ -1,18 +1,16 @@
-import requests
-from services.ollama_service import OLLAMA_URL
-from utils.ollama_errors import check_ollama_health
+import logging
+from typing import AsyncIterator
 
+import httpx
+from core.config import settings
+from services.metrics import observe_ollama
+from services.llm_scheduler import PRIORITY_INTERACTIVE, llm_scheduler
+from utils.ollama_errors import OllamaConnectionError
 
-def generate_response(query, markdown_content: str):
-    try:
-        check_ollama_health()
 
-        # Ensure context is not empty
-        if not markdown_content.strip():
-            return "No relevant information available in the uploaded documents."
-
-        # Explicitly instruct the LLM to answer only based on the provided context
-        prompt = f"""You are a helpful assistant. Answer the question strictly using the following document content. Do not use any external knowledge or assumptions.
+def build_prompt(query, markdown_content: str) -> str:
+    # Explicitly instruct the LLM to answer only based on the provided context
+    return f"""You are a helpful assistant. Answer the question strictly using the following document content. Do not use any external knowledge or assumptions.
 
                     ---DOCUMENT---
                     {markdown_content}
@@ -21,23 +19,63 @@ def generate_response(query, markdown_content: str):
                     {query}
                     """
 
-        print(f"Markdown Content: {markdown_content[:500]}")  # Print the first 500 characters
-
-
-        response = requests.post(
-            OLLAMA_URL,
-            json={
-                "model": "llama3.2-vision",
-                "prompt": prompt,
-                "stream": False
-            }
-        )
-        response.raise_for_status()
-        return response.json().get("response", "")
-    except Exception as e:
-        error_msg = str(e)
-        if "Connection refused" in error_msg:
-            error_msg = "Could not connect to Ollama server. Please ensure Ollama is installed and running."
-        elif "model not found" in error_msg.lower():
-            error_msg = "Model not found. Please run: ollama pull llama3.2-vision"
-        return f"Error: {error_msg}"
\ No newline at end of file
+
+def describe_error(e: Exception) -> str:
+    error_msg = str(e)
+    if isinstance(e, OllamaConnectionError):
+        return error_msg
+    if "Connection refused" in error_msg or isinstance(e, httpx.ConnectError):
+        error_msg = "Could not connect to Ollama server. Please ensure Ollama is installed and running."
+    elif isinstance(e, httpx.TimeoutException):
+        error_msg = "Timed out waiting for the Ollama server."
+    elif "not found" in error_msg.lower():
+        error_msg = f"Model not found. Please run: ollama pull {settings.OLLAMA_MODEL}"
+    return error_msg
+
+
+def log_timings(data: dict) -> None:
+    """Record the prompt-evaluation and generation timings Ollama reports."""
+    if "prompt_eval_duration" not in data and "eval_duration" not in data:
+        return
+    observe_ollama(data)
+    logging.debug(
+        f"Ollama prompt eval: {data.get('prompt_eval_count', 0)} tokens in "
+        f"{data.get('prompt_eval_duration', 0) / 1e6:.0f} ms; generation: "
+        f"{data.get('eval_count', 0)} tokens in {data.get('eval_duration', 0) / 1e6:.0f} ms"
+    )
+
+
+async def generate_answer(query, markdown_content: str, priority: int = PRIORITY_INTERACTIVE) -> str:
+    """Generate an answer from the context, raising on failure.
+
+    Waits for a slot from the LLM scheduler; raises OllamaBusyError if
+    there is none to be had.
+    """
+    # Ensure context is not empty
+    if not markdown_content.strip():
+        return "No relevant information available in the uploaded documents."
+
+    logging.debug("Markdown Content: %s", markdown_content[:500])
+
+    async with llm_scheduler.slot(priority) as client:
+        data = await client.generate(build_prompt(query, markdown_content))
+    log_timings(data)
+    return data.get("response", "")
+
+
+async def stream_response(query, markdown_content: str,
+                          priority: int = PRIORITY_INTERACTIVE) -> AsyncIterator[str]:
+    """Yield response tokens from Ollama as they are generated.
+
+    The scheduler slot is held until the stream ends or is closed.
+    """
+    if not markdown_content.strip():
+        yield "No relevant information available in the uploaded documents."
+        return
+
+    async with llm_scheduler.slot(priority) as client:
+        async for data in client.stream(build_prompt(query, markdown_content)):
+            if data.get("response"):
+                yield data["response"]
+            if data.get("done"):
+                log_timings(data)
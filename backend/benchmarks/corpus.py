@@ -0,0 +1,47 @@
+"""Helpers shared by the benchmarks: generated PDF corpora and latency stats."""
+import os
+import random
+from typing import Dict, List, Sequence
+
+import fitz  # PyMuPDF
+import numpy as np
+
+WORDS = ("pump valve sensor torque bracket gasket firmware calibration voltage "
+         "housing bearing clamp relay fuse coupling manifold actuator").split()
+
+
+def make_corpus(directory: str, files: int, pages: int, seed: int = 0, lines_per_page: int = 30) -> List[str]:
+    """Write files PDFs of random technical-sounding text and return their paths."""
+    rng = random.Random(seed)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for i in range(files):
+        path = os.path.join(directory, f"doc-{i:03d}.pdf")
+        with fitz.open() as pdf:
+            for _ in range(pages):
+                page = pdf.new_page()
+                lines = [" ".join(rng.choices(WORDS, k=10)) + f" part AX-{rng.randint(1000, 9999)}."
+                         for _ in range(lines_per_page)]
+                page.insert_textbox(page.rect + (50, 50, -50, -50), "\n".join(lines), fontsize=9)
+            pdf.save(path)
+        paths.append(path)
+    return paths
+
+
+def make_queries(count: int, seed: int = 0) -> List[str]:
+    rng = random.Random(seed)
+    return [f"Which {' '.join(rng.choices(WORDS, k=2))} is part AX-{rng.randint(1000, 9999)}?"
+            for _ in range(count)]
+
+
+def percentiles(latencies: Sequence[float]) -> Dict[str, float]:
+    """Count and p50/p95/p99/max of latencies given in milliseconds."""
+    if not latencies:
+        return {}
+    return {
+        "count": len(latencies),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 2),
+        "max_ms": round(float(max(latencies)), 2),
+    }
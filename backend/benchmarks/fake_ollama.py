@@ -0,0 +1,126 @@
+"""Local stand-in for the Ollama API, for benchmarks.
+
+Serves /api/tags and /api/generate (streamed or not). Prompt evaluation and
+generation are simulated by sleeping at the configured token rates, and the
+responses carry the same timing fields Ollama reports.
+
+    python -m benchmarks.fake_ollama --port 11434 --tokens-per-second 30
+"""
+import argparse
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOllama:
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, tokens_per_second: float = 50.0,
+                 prompt_tokens_per_second: float = 1000.0, response_tokens: int = 64):
+        self.tokens_per_second = tokens_per_second
+        self.prompt_tokens_per_second = prompt_tokens_per_second
+        self.response_tokens = response_tokens
+        self.requests = 0
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def _send_json(self, payload: dict) -> None:
+                body = json.dumps(payload).encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def do_GET(self):
+                if self.path == "/api/tags":
+                    self._send_json({"models": [{"name": "fake"}]})
+                else:
+                    self.send_error(404)
+
+            def do_POST(self):
+                if self.path != "/api/generate":
+                    self.send_error(404)
+                    return
+                request = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                fake.requests += 1
+
+                prompt_tokens = max(1, len(request.get("prompt", "")) // 4)
+                prompt_seconds = prompt_tokens / fake.prompt_tokens_per_second
+                token_seconds = 1.0 / fake.tokens_per_second
+                time.sleep(prompt_seconds)
+                timings = {
+                    "prompt_eval_count": prompt_tokens,
+                    "prompt_eval_duration": int(prompt_seconds * 1e9),
+                    "eval_count": fake.response_tokens,
+                    "eval_duration": int(fake.response_tokens * token_seconds * 1e9),
+                }
+                model = request.get("model", "fake")
+
+                if not request.get("stream", True):
+                    time.sleep(fake.response_tokens * token_seconds)
+                    self._send_json({"model": model, "response": "token " * fake.response_tokens,
+                                     "done": True, **timings})
+                    return
+
+                self.send_response(200)
+                self.send_header("Content-Type", "application/x-ndjson")
+                self.send_header("Transfer-Encoding", "chunked")
+                self.end_headers()
+                for _ in range(fake.response_tokens):
+                    time.sleep(token_seconds)
+                    self._write_chunk({"model": model, "response": "token ", "done": False})
+                self._write_chunk({"model": model, "response": "", "done": True, **timings})
+                self.wfile.write(b"0\r\n\r\n")
+
+            def _write_chunk(self, payload: dict) -> None:
+                line = json.dumps(payload).encode("utf-8") + b"\n"
+                self.wfile.write(f"{len(line):x}\r\n".encode("ascii") + line + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0)
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=1000.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    args = parser.parse_args()
+
+    fake = FakeOllama(args.host, args.port, args.tokens_per_second,
+                      args.prompt_tokens_per_second, args.response_tokens).start()
+    print(f"Fake Ollama listening on {fake.url}")
+    try:
+        fake._thread.join()
+    except KeyboardInterrupt:
+        fake.stop()
+
+
+if __name__ == "__main__":
+    main()
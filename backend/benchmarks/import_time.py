@@ -0,0 +1,81 @@
+"""Import-time budget check for the FastAPI app.
+
+Imports `main` in a fresh interpreter and fails (exit code 1) if that takes
+longer than the budget, or if a module that should only be loaded on first
+use (torch, sentence_transformers, ...) was imported along the way. Prints
+the slowest imports, from `python -X importtime`.
+
+    python -m benchmarks.import_time --budget-ms 3000
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app")
+
+# Loaded by the warm-up or on first use, never by importing the app
+LAZY_MODULES = ("torch", "sentence_transformers", "transformers", "fitz", "pymupdf", "docx")
+
+PROBE = f"""
+import json, sys, time
+started = time.perf_counter()
+import main
+elapsed = time.perf_counter() - started
+print(json.dumps({{"seconds": elapsed, "loaded": [m for m in {LAZY_MODULES!r} if m in sys.modules]}}))
+"""
+
+
+def slowest_imports(stderr: str, top: int):
+    rows = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((int(cumulative_us), name.strip()))
+    rows.sort(reverse=True)
+    return [{"module": name, "cumulative_ms": round(us / 1000, 1)} for us, name in rows[:top]]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget-ms", type=float, default=3000.0)
+    parser.add_argument("--top", type=int, default=15, help="number of slowest imports to list")
+    parser.add_argument("--runs", type=int, default=3, help="report the fastest of this many runs")
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        completed = subprocess.run(
+            [sys.executable, "-X", "importtime", "-c", PROBE],
+            cwd=APP_DIR, capture_output=True, text=True,
+            # Keep the warm-up and Ollama out of it: only the import is measured
+            env={**os.environ, "WARMUP_ON_STARTUP": "false", "OLLAMA_MANAGE_SERVER": "false"},
+        )
+        if completed.returncode != 0:
+            print(completed.stderr[-2000:], file=sys.stderr)
+            sys.exit(completed.returncode)
+        results.append((json.loads(completed.stdout.strip().splitlines()[-1]), completed.stderr))
+
+    probe, stderr = min(results, key=lambda result: result[0]["seconds"])
+    report = {
+        "import_ms": round(probe["seconds"] * 1000, 1),
+        "budget_ms": args.budget_ms,
+        "eagerly_loaded": probe["loaded"],
+        "slowest_imports": slowest_imports(stderr, args.top),
+    }
+    print(json.dumps(report, indent=2))
+
+    failures = []
+    if report["import_ms"] > args.budget_ms:
+        failures.append(f"importing main took {report['import_ms']} ms, over the {args.budget_ms} ms budget")
+    if probe["loaded"]:
+        failures.append(f"importing main loaded {', '.join(probe['loaded'])}")
+    for failure in failures:
+        print(f"FAIL: {failure}", file=sys.stderr)
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == "__main__":
+    main()
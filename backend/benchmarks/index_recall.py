@@ -0,0 +1,107 @@
+"""Recall-vs-latency report for the configurable vector index types.
+
+Builds every requested index type over the same vectors and compares its
+top-k results with the exact flat index.
+
+    python -m benchmarks.index_recall --vectors 100000 --configs hnsw:none,ivf:pq,flat:sq8:0
+
+A config is index_type:quantization, optionally followed by :rescore to
+override VECTOR_INDEX_RESCORE (0 turns exact rescoring off).
+
+Vectors are random unless --from-cache points at an embedding cache
+(EMBEDDING_CACHE_PATH), in which case real gte-large vectors are used.
+"""
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+import faiss  # noqa: E402
+from langchain.schema import Document  # noqa: E402
+from services.vector_store import VectorStore  # noqa: E402
+
+
+def load_vectors(args) -> np.ndarray:
+    if args.from_cache:
+        conn = sqlite3.connect(args.from_cache)
+        rows = conn.execute("SELECT vector FROM embeddings LIMIT ?", (args.vectors + args.queries,)).fetchall()
+        return np.stack([np.frombuffer(blob, dtype=np.float32) for (blob,) in rows])
+    rng = np.random.default_rng(args.seed)
+    return rng.standard_normal((args.vectors + args.queries, args.dimension)).astype(np.float32)
+
+
+def build(index_type: str, quantization: str, vectors: np.ndarray, batch: int = 10000,
+          rescore=None) -> VectorStore:
+    store = VectorStore(vectors.shape[1], index_type, quantization, rescore=rescore)
+    for start in range(0, len(vectors), batch):
+        ids = [str(i) for i in range(start, min(start + batch, len(vectors)))]
+        store.add(ids, [Document(page_content="") for _ in ids], vectors[start:start + len(ids)])
+    return store
+
+
+def measure(store: VectorStore, queries: np.ndarray, k: int):
+    results, latencies = [], []
+    for query in queries:
+        started = time.perf_counter()
+        hits = store.search(query, k)
+        latencies.append((time.perf_counter() - started) * 1000)
+        results.append([int(doc_id) for doc_id, _, _ in hits])
+    return results, latencies
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--vectors", type=int, default=20000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--configs", default="flat:fp16,flat:sq8,flat:sq8:0,hnsw:none,hnsw:sq8,ivf:none,ivf:sq8,ivf:pq",
+                        help="comma-separated index_type:quantization[:rescore] configs")
+    parser.add_argument("--from-cache", help="read vectors from an embedding cache SQLite file")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    vectors = load_vectors(args)
+    corpus, queries = vectors[:-args.queries], vectors[-args.queries:]
+
+    baseline_store = build("flat", "none", corpus)
+    truth, _ = measure(baseline_store, queries, args.k)
+
+    report = []
+    for config in ["flat:none"] + [c for c in args.configs.split(",") if c and c != "flat:none"]:
+        index_type, quantization, *rescore = config.split(":")
+        started = time.perf_counter()
+        store = baseline_store if config == "flat:none" else build(
+            index_type, quantization, corpus, rescore=int(rescore[0]) if rescore else None)
+        build_seconds = time.perf_counter() - started
+        results, latencies = measure(store, queries, args.k)
+        recall = np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth) if t])
+        report.append({
+            "config": config,
+            "index": store.description,
+            # Still the exact staging index: not enough vectors to train yet
+            "staged_as_flat": store.staging,
+            "rescore": store.rescore if store.exact is not None else 0,
+            "vectors": len(corpus),
+            "build_seconds": round(build_seconds, 3),
+            "index_bytes": int(faiss.serialize_index(store.index).nbytes),
+            f"recall@{args.k}": round(float(recall), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+            "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        })
+        print(json.dumps(report[-1]))
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,240 @@
+"""Bytes per chunk of the in-memory corpus, before and after compaction.
+
+Generates chunks shaped like the ingest pipeline's (CHUNK_SIZE characters
+of Zipf-distributed words with source, page and start_index metadata, a
+uuid docstore id) and random vectors, then measures with tracemalloc:
+
+- chunk storage: a dict of LangChain Documents plus the id <-> label dicts
+  (what the vector store used to keep), against the columnar ChunkStore
+- lookup storage: the BM25 postings and the processor's content-hash maps
+  (chunk_index, file_chunks, file_digests), as a worker holds them after
+  loading a snapshot, against the dict-of-dict layout they replaced
+- vector storage: the FAISS index for each --quantizations encoding (by
+  its serialized size, as FAISS allocates outside tracemalloc's view), and
+  the float32 copy kept for rescoring (memory-mapped once saved, so it is
+  reported separately), with recall@k against exact search
+
+    python -m benchmarks.memory_footprint --chunks 50000 --dimension 1024 --output results/memory.json
+"""
+import argparse
+import gc
+import json
+import os
+import pickle
+import random
+import sys
+import tracemalloc
+import uuid
+
+import faiss
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from benchmarks.corpus import WORDS  # noqa: E402
+from core.config import settings  # noqa: E402
+from langchain.schema import Document  # noqa: E402
+from services.chunk_index import ChunkIndex, pack_digests  # noqa: E402
+from services.chunk_store import ChunkStore  # noqa: E402
+from services.document_processor import hash_text  # noqa: E402
+from services.lexical_index import LexicalIndex, tokenize  # noqa: E402
+from services.vector_store import VectorStore  # noqa: E402
+
+
+def make_vocabulary(rng: random.Random, size: int):
+    """WORDS plus random words, with Zipf-distributed cumulative weights."""
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    words = list(WORDS)
+    while len(words) < size:
+        words.append("".join(rng.choices(letters, k=rng.randint(3, 10))))
+    cum_weights, total = [], 0.0
+    for rank in range(1, size + 1):
+        total += 1.0 / rank
+        cum_weights.append(total)
+    return words, cum_weights
+
+
+def make_chunks(count: int, seed: int, vocabulary: int = 20000):
+    rng = random.Random(seed)
+    # A realistic spread of terms per chunk, which sizes the BM25 postings
+    words_by_rank, cum_weights = make_vocabulary(rng, vocabulary)
+    documents = []
+    for i in range(count):
+        words = []
+        while sum(len(word) + 1 for word in words) < settings.CHUNK_SIZE:
+            words.extend(rng.choices(words_by_rank, cum_weights=cum_weights, k=8))
+        documents.append(Document(
+            page_content=" ".join(words),
+            metadata={"source": f"/data/files/doc-{i // 200:04d}.pdf", "page": (i // 10) % 20,
+                      "start_index": (i % 10) * settings.CHUNK_SIZE},
+        ))
+    return [str(uuid.uuid4()) for _ in range(count)], documents
+
+
+def allocated(build):
+    """Return what build() returns and the bytes it left allocated."""
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        result = build()
+        gc.collect()
+        return result, tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+
+
+def chunk_storage(ids, documents):
+    text_bytes = sum(len(document.page_content.encode("utf-8")) for document in documents)
+
+    def legacy():
+        # Fresh copies of the texts and metadata, so they are counted
+        docstore = {doc_id: Document(page_content=document.page_content.encode("utf-8").decode("utf-8"),
+                                     metadata=dict(document.metadata))
+                    for doc_id, document in zip(ids, documents)}
+        id_to_label = {doc_id: label for label, doc_id in enumerate(ids)}
+        label_to_id = {label: doc_id for doc_id, label in id_to_label.items()}
+        return docstore, id_to_label, label_to_id
+
+    def columnar():
+        store = ChunkStore()
+        store.add(ids, list(range(len(ids))), documents)
+        return store
+
+    report = {"text_bytes_per_chunk": round(text_bytes / len(ids), 1)}
+    for name, build in (("documents", legacy), ("chunk_store", columnar)):
+        _, nbytes = allocated(build)
+        report[name] = {
+            "bytes_per_chunk": round(nbytes / len(ids), 1),
+            "overhead_per_chunk": round((nbytes - text_bytes) / len(ids), 1),
+        }
+    report["reduction"] = round(1 - report["chunk_store"]["bytes_per_chunk"] / report["documents"]["bytes_per_chunk"], 3)
+    return report
+
+
+def lookup_storage(ids, documents):
+    texts = [document.page_content for document in documents]
+    sources = [document.metadata["source"] for document in documents]
+    digests = [hash_text(text) for text in texts]
+    file_chunks = {}
+    for source, digest in zip(sources, digests):
+        file_chunks.setdefault(os.path.basename(source), []).append(digest)
+    file_digests = {name: hash_text(name) for name in file_chunks}
+
+    # Round-tripped through a snapshot's files like a loaded worker, so each
+    # structure holds its own copies of ids and digests
+    def legacy_lexical():
+        postings, lengths = {}, {}
+        for doc_id, text in zip(ids, texts):
+            tokens = tokenize(text)
+            for token in tokens:
+                entry = postings.setdefault(token, {})
+                entry[doc_id] = entry.get(doc_id, 0) + 1
+            lengths[doc_id] = len(tokens)
+        return pickle.loads(pickle.dumps((postings, lengths)))
+
+    def lexical():
+        index = LexicalIndex()
+        for doc_id, text in zip(ids, texts):
+            index.add(doc_id, text)
+        return pickle.loads(pickle.dumps(index))
+
+    def legacy_content_hash():
+        manifest = {
+            "chunk_index": dict(zip(digests, ids)),
+            "file_digests": file_digests,
+            "file_chunks": file_chunks,
+            "chunk_refs": dict.fromkeys(digests, 1),
+        }
+        return json.loads(json.dumps(manifest))
+
+    def content_hash():
+        chunk_index = ChunkIndex.from_maps(dict(zip(digests, ids)), dict.fromkeys(digests, 1))
+        packed = {name: pack_digests(chunk_digests) for name, chunk_digests in file_chunks.items()}
+        return pickle.loads(pickle.dumps((chunk_index, packed))), json.loads(json.dumps(file_digests))
+
+    report = {}
+    for name, legacy, build in (("lexical_index", legacy_lexical, lexical),
+                                ("content_hash_maps", legacy_content_hash, content_hash)):
+        _, legacy_bytes = allocated(legacy)
+        _, nbytes = allocated(build)
+        report[name] = {
+            "legacy_bytes_per_chunk": round(legacy_bytes / len(ids), 1),
+            "bytes_per_chunk": round(nbytes / len(ids), 1),
+            "reduction": round(1 - nbytes / legacy_bytes, 3),
+        }
+    return report
+
+
+def vector_storage(ids, vectors, queries, quantizations, k: int):
+    empty = [Document(page_content="") for _ in ids]
+
+    def build(quantization: str, rescore: int) -> VectorStore:
+        store = VectorStore(vectors.shape[1], "flat", quantization, rescore=rescore)
+        store.add(ids, empty, vectors)
+        return store
+
+    exact_store = build("none", 0)
+    truth = [[doc_id for doc_id, _, _ in hits] for hits in exact_store.search_many(queries, k)]
+    del exact_store
+
+    report = []
+    for quantization in quantizations:
+        for rescore in sorted({0, settings.VECTOR_INDEX_RESCORE} if quantization != "none" else {0}):
+            store = build(quantization, rescore)
+            exact_bytes = store.exact_nbytes
+            results = [[doc_id for doc_id, _, _ in hits] for hits in store.search_many(queries, k)]
+            recall = np.mean([len(set(r) & set(t)) / len(t) for r, t in zip(results, truth)])
+            report.append({
+                "quantization": quantization,
+                # Trainable encodings stay exact until VECTOR_INDEX_TRAIN_MIN vectors are added
+                "staged_as_flat": store.staging,
+                "rescore": rescore,
+                # FAISS allocates outside Python, so its serialized size stands in
+                "index_bytes_per_chunk": round(faiss.serialize_index(store.index).nbytes / len(ids), 1),
+                "rescore_vector_bytes_per_chunk": round(exact_bytes / len(ids), 1),
+                f"recall@{k}": round(float(recall), 4),
+            })
+            del store
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--chunks", type=int, default=20000)
+    parser.add_argument("--dimension", type=int, default=1024)
+    parser.add_argument("--vocabulary", type=int, default=20000, help="distinct words in the generated text")
+    parser.add_argument("--queries", type=int, default=100)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--quantizations", default="none,fp16,sq8")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    ids, documents = make_chunks(args.chunks, args.seed, args.vocabulary)
+    rng = np.random.default_rng(args.seed)
+    vectors = rng.standard_normal((args.chunks + args.queries, args.dimension)).astype(np.float32)
+    corpus, queries = vectors[:args.chunks], vectors[args.chunks:]
+
+    chunks = chunk_storage(ids, documents)
+    lookups = lookup_storage(ids, documents)
+    report = {
+        "chunks": args.chunks,
+        "dimension": args.dimension,
+        "chunk_size": settings.CHUNK_SIZE,
+        "chunk_storage": chunks,
+        "lookup_storage": lookups,
+        # Python-heap bytes per chunk outside FAISS: chunks plus lookups
+        "heap_bytes_per_chunk": round(chunks["chunk_store"]["bytes_per_chunk"]
+                                      + sum(entry["bytes_per_chunk"] for entry in lookups.values()), 1),
+        "vector_storage": vector_storage(ids, corpus, queries, args.quantizations.split(","), args.k),
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,314 @@
+"""End-to-end RAG benchmark through the FastAPI app.
+
+Starts the app with uvicorn against a fake Ollama server, uploads a
+generated PDF corpus through /upload, then chats through /chat at each
+requested concurrency and deletes the files through DELETE /upload. Reports:
+
+- ingest docs/s and chunks/s (upload until every job is finished)
+- embedding chunks/s (re-encoding the indexed chunks without the cache)
+- retrieval p50/p99 (query embedding plus hybrid search, in process), one
+  query at a time and with all of them in flight at once
+- /chat latency and throughput at each number of concurrent users, and how
+  many requests the LLM scheduler turned away (429/503)
+- delete latency and peak RSS of the app and its parse processes
+
+    python -m benchmarks.rag_e2e --docs 50 --pages 5 --users 1,4,16 --output results/run.json
+
+Everything is written to a temporary directory, so the configured store is
+left alone. The JSON report includes the configuration and git commit so
+runs can be compared.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import resource
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(BACKEND_DIR, "app"))
+
+from benchmarks.corpus import make_corpus, make_queries, percentiles  # noqa: E402
+from benchmarks.fake_ollama import FakeOllama  # noqa: E402
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def git_commit() -> str:
+    try:
+        return subprocess.check_output(["git", "rev-parse", "HEAD"], cwd=BACKEND_DIR, text=True).strip()
+    except Exception:
+        return ""
+
+
+def parse_process_peaks():
+    """Peak RSS in bytes (VmHWM) of each running parse process.
+
+    Read from /proc while the pool is alive: getrusage(RUSAGE_CHILDREN)
+    only covers children that have exited, and only the largest of them.
+    """
+    peaks = []
+    for pid in filter(str.isdigit, os.listdir("/proc")):
+        try:
+            with open(f"/proc/{pid}/cmdline", "rb") as f:
+                if b"spawn_main" not in f.read():
+                    continue
+            with open(f"/proc/{pid}/status", encoding="utf-8") as f:
+                status = dict(line.split(":", 1) for line in f if ":" in line)
+        except OSError:
+            continue  # exited meanwhile
+        if int(status["PPid"]) == os.getpid() and "VmHWM" in status:
+            peaks.append(int(status["VmHWM"].split()[0]) * 1024)
+    return peaks
+
+
+def configure(workdir: str, ollama_url: str) -> None:
+    """Point the app at the work directory and fake Ollama; must run before importing it."""
+    os.environ.update({
+        "VECTOR_STORE_DIR": os.path.join(workdir, "vectorstore"),
+        "FILES_DIR": os.path.join(workdir, "files"),
+        "EMBEDDING_CACHE_PATH": os.path.join(workdir, "embeddings.sqlite3"),
+        "OLLAMA_BASE_URL": ollama_url,
+        "OLLAMA_MANAGE_SERVER": "false",
+        # Every request should reach the model
+        "ANSWER_CACHE_ENABLED": "false",
+    })
+
+
+def start_app(port: int, timeout: float):
+    """Serve the app from a background thread; exit if it has not started within timeout seconds."""
+    import uvicorn
+    from main import app
+
+    server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=port, log_level="warning"))
+    errors = []
+
+    def run():
+        try:
+            server.run()
+        except BaseException as e:  # uvicorn calls sys.exit() when startup fails
+            errors.append(e)
+
+    thread = threading.Thread(target=run, daemon=True)
+    thread.start()
+    deadline = time.monotonic() + timeout
+    while not server.started:
+        if not thread.is_alive():
+            error = errors[0] if errors else None
+            if error is None or isinstance(error, SystemExit):
+                raise SystemExit("The app failed to start; see the log above.")
+            raise SystemExit(f"The app failed to start: {error!r}")
+        if time.monotonic() > deadline:
+            server.should_exit = True
+            raise SystemExit(f"The app did not start within {timeout:.0f}s.")
+        time.sleep(0.05)
+    return server, thread
+
+
+async def ingest(client, paths):
+    started = time.perf_counter()
+    files = [("file", (os.path.basename(path), open(path, "rb"), "application/pdf")) for path in paths]
+    try:
+        response = await client.post("/upload/", files=files)
+    finally:
+        for _, (_, f, _) in files:
+            f.close()
+    response.raise_for_status()
+    job_id = response.json()["job_id"]
+    while True:
+        job = (await client.get(f"/upload/jobs/{job_id}")).json()
+        if job["status"] not in ("queued", "running"):
+            break
+        await asyncio.sleep(0.1)
+    elapsed = time.perf_counter() - started
+
+    failed = [f for f in job["files"] if f["stage"] == "failed"]
+    chunks = sum(f["chunks_added"] for f in job["files"])
+    return {
+        "docs": len(paths),
+        "failed": len(failed),
+        "chunks": chunks,
+        "seconds": round(elapsed, 3),
+        "docs_per_s": round(len(paths) / elapsed, 2),
+        "chunks_per_s": round(chunks / elapsed, 2),
+    }
+
+
+def embedding_throughput():
+    from services.collection_manager import collection_manager
+    from services.embedding_service import embedding_service
+
+    processor = collection_manager.get("default")
+    texts = [doc.page_content for doc in processor.vector_store.docstore.values()]
+    cache, embedding_service.cache = embedding_service.cache, None
+    try:
+        started = time.perf_counter()
+        embedding_service.embed(texts)
+        elapsed = time.perf_counter() - started
+    finally:
+        embedding_service.cache = cache
+    return {"chunks": len(texts), "seconds": round(elapsed, 3), "chunks_per_s": round(len(texts) / elapsed, 2)}
+
+
+async def retrieval_latency(queries, concurrent: bool):
+    from routers.chat import retrieve
+
+    latencies = []
+
+    async def timed_retrieve(query):
+        started = time.perf_counter()
+        await retrieve(query, "default")
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    if concurrent:
+        await asyncio.gather(*(timed_retrieve(query) for query in queries))
+    else:
+        for query in queries:
+            await timed_retrieve(query)
+    elapsed = time.perf_counter() - started
+    return {"queries_per_s": round(len(queries) / elapsed, 2), **percentiles(latencies)}
+
+
+async def chat_load(client, queries, users: int, per_user: int):
+    latencies, errors, rejected = [], 0, 0
+
+    async def user(offset: int):
+        nonlocal errors, rejected
+        for i in range(per_user):
+            query = queries[(offset * per_user + i) % len(queries)]
+            started = time.perf_counter()
+            response = await client.post("/chat/", json={"query": query})
+            latencies.append((time.perf_counter() - started) * 1000)
+            if response.status_code in (429, 503):
+                rejected += 1
+            elif response.status_code != 200 or response.json()["response"].startswith("Error:"):
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(user(i) for i in range(users)))
+    elapsed = time.perf_counter() - started
+    return {"users": users, "errors": errors, "rejected": rejected,
+            "requests_per_s": round(len(latencies) / elapsed, 2),
+            **percentiles(latencies)}
+
+
+async def delete_all(client, paths):
+    latencies = []
+    for path in paths:
+        started = time.perf_counter()
+        response = await client.delete(f"/upload/{os.path.basename(path)}")
+        response.raise_for_status()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return percentiles(latencies)
+
+
+async def run(args, base_url: str, paths, queries):
+    import httpx
+
+    async with httpx.AsyncClient(base_url=base_url, timeout=600) as client:
+        report = {"ingest": await ingest(client, paths)}
+        report["embedding"] = await asyncio.to_thread(embedding_throughput)
+        # Separate halves, so the concurrent run is not served from the embedding cache
+        report["retrieval"] = await retrieval_latency(queries[::2], concurrent=False)
+        report["retrieval_concurrent"] = await retrieval_latency(queries[1::2], concurrent=True)
+        report["chat"] = [await chat_load(client, queries, users, args.queries_per_user)
+                          for users in args.users]
+        report["delete"] = await delete_all(client, paths)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--docs", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=5)
+    parser.add_argument("--users", default="1,4,16", help="comma-separated concurrent chat users")
+    parser.add_argument("--queries-per-user", type=int, default=5)
+    parser.add_argument("--tokens-per-second", type=float, default=50.0, help="fake Ollama generation rate")
+    parser.add_argument("--prompt-tokens-per-second", type=float, default=1000.0)
+    parser.add_argument("--response-tokens", type=int, default=64)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    parser.add_argument("--keep-workdir", action="store_true", help="keep the generated corpus and store")
+    parser.add_argument("--startup-timeout", type=float, default=120.0, help="seconds to wait for the app to start")
+    args = parser.parse_args()
+    args.users = [int(n) for n in args.users.split(",") if n]
+
+    workdir = tempfile.mkdtemp(prefix="rag-bench-")
+    fake = FakeOllama(tokens_per_second=args.tokens_per_second,
+                      prompt_tokens_per_second=args.prompt_tokens_per_second,
+                      response_tokens=args.response_tokens).start()
+    configure(workdir, fake.url)
+
+    paths = make_corpus(os.path.join(workdir, "corpus"), args.docs, args.pages, args.seed)
+    queries = make_queries(max(50, max(args.users) * args.queries_per_user), args.seed)
+    port = free_port()
+    try:
+        server, thread = start_app(port, args.startup_timeout)
+    except SystemExit:
+        fake.stop()
+        raise
+    parse_peaks = []
+    try:
+        report = asyncio.run(run(args, f"http://127.0.0.1:{port}", paths, queries))
+        parse_peaks = parse_process_peaks()
+    finally:
+        from services.ingest_jobs import ingest_jobs
+        ingest_jobs.shutdown(wait=True)
+        server.should_exit = True
+        thread.join()
+        fake.stop()
+
+    from core.config import settings
+    from services.llm_scheduler import llm_scheduler
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("output", "keep_workdir")},
+        "settings": {
+            "embedding_model": settings.EMBEDDING_MODEL,
+            "index": f"{settings.VECTOR_INDEX_TYPE}/{settings.VECTOR_INDEX_QUANTIZATION}",
+            "hybrid_search": settings.HYBRID_SEARCH,
+            "query_batching": settings.QUERY_BATCHING,
+            "rerank_model": settings.RERANK_MODEL,
+            "ollama_endpoints": len(llm_scheduler.clients),
+            "ollama_max_concurrency": settings.OLLAMA_MAX_CONCURRENCY,
+            "ollama_max_queue": settings.OLLAMA_MAX_QUEUE,
+        },
+        "environment": {
+            "git_commit": git_commit(),
+            "python": platform.python_version(),
+            "cpus": os.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        **report,
+        "peak_rss_bytes": {
+            # ru_maxrss is in KiB on Linux
+            "app": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+            "parse_process_count": len(parse_peaks),
+            "parse_process_max": max(parse_peaks, default=0),
+            "parse_processes_total": sum(parse_peaks),
+        },
+    }
+    print(json.dumps(report, indent=2))
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.keep_workdir:
+        print(f"Work directory kept at {workdir}", file=sys.stderr)
+    else:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
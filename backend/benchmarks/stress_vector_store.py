@@ -0,0 +1,122 @@
+"""Concurrent upload/delete/query stress test for a document collection.
+
+Writer threads keep ingesting and deleting generated PDFs while reader
+threads run hybrid searches against the same DocumentProcessor, the way
+background ingestion and /chat share it. Reports errors and query latency
+percentiles, and exits non-zero if any operation failed.
+
+    python -m benchmarks.stress_vector_store --writers 2 --readers 8 --duration 60
+
+Uses the configured embedding model; the store is written to a temporary
+directory unless --store-dir is given.
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+import traceback
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app"))
+
+from benchmarks.corpus import WORDS, make_corpus, percentiles  # noqa: E402
+from services.document_processor import DocumentProcessor  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=20)
+    parser.add_argument("--pages", type=int, default=3)
+    parser.add_argument("--writers", type=int, default=2)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--duration", type=float, default=30.0, help="seconds")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--store-dir", help="persist the store here instead of a temporary directory")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="write the report as JSON to this path")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="stress-")
+    try:
+        paths = make_corpus(workdir, args.files, args.pages, args.seed)
+        processor = DocumentProcessor(store_dir=args.store_dir or os.path.join(workdir, "store"))
+        # Start with half the corpus indexed so queries have something to find
+        for path in paths[::2]:
+            processor.process_document(path)
+
+        stop = threading.Event()
+        lock = threading.Lock()
+        latencies = {"query": [], "upload": [], "delete": []}
+        errors = []
+
+        def record(kind, started):
+            with lock:
+                latencies[kind].append((time.perf_counter() - started) * 1000)
+
+        def fail(kind):
+            with lock:
+                errors.append({"operation": kind, "error": traceback.format_exc(limit=3)})
+
+        def writer(seed):
+            rng = random.Random(seed)
+            while not stop.is_set():
+                path = rng.choice(paths)
+                kind = "delete" if processor.is_indexed(os.path.basename(path)) else "upload"
+                started = time.perf_counter()
+                try:
+                    if kind == "delete":
+                        processor.delete_document(os.path.basename(path))
+                    else:
+                        processor.process_document(path)
+                    record(kind, started)
+                except Exception:
+                    fail(kind)
+
+        def reader(seed):
+            rng = random.Random(seed)
+            while not stop.is_set():
+                query = " ".join(rng.choices(WORDS, k=3))
+                vector = processor.embed_query(query)
+                started = time.perf_counter()
+                try:
+                    hits = processor.hybrid_search(query, args.k, vector=vector)
+                    if any(doc is None for _, doc, _ in hits):
+                        raise AssertionError(f"search returned a missing document: {hits}")
+                    record("query", started)
+                except Exception:
+                    fail("query")
+
+        threads = [threading.Thread(target=writer, args=(args.seed + i,)) for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(args.seed + 1000 + i,)) for i in range(args.readers)]
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        report = {
+            "writers": args.writers,
+            "readers": args.readers,
+            "duration_s": args.duration,
+            "chunks_indexed": len(processor.chunk_index),
+            "errors": len(errors),
+            **{kind: percentiles(values) for kind, values in latencies.items()},
+        }
+        print(json.dumps(report, indent=2))
+        for error in errors[:5]:
+            print(f"{error['operation']} failed:\n{error['error']}", file=sys.stderr)
+        if args.output:
+            with open(args.output, "w", encoding="utf-8") as f:
+                json.dump(report, f, indent=2)
+        sys.exit(1 if errors else 0)
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
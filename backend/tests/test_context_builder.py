@@ -0,0 +1,35 @@
+import pytest
+from langchain.schema import Document
+
+from core.config import settings
+from utils.context_builder import build_context, count_tokens
+
+
+@pytest.fixture(autouse=True)
+def estimated_tokens(monkeypatch):
+    monkeypatch.setattr(settings, "CONTEXT_TOKENIZER", "")
+
+
+@pytest.mark.parametrize("budget", [50, 100, 200])
+def test_budget_smaller_than_one_chunk_keeps_the_trimmed_chunk(budget):
+    text = " ".join(f"word{i}" for i in range(1000))
+    doc = Document(page_content=text, metadata={"source": "/files/manual.pdf", "page": 0, "start_index": 0})
+
+    context = build_context([doc], token_budget=budget)
+
+    assert context.chunks_used == 1
+    assert "## Section 1 (manual.pdf, page 1)" in context.markdown
+    assert "word0 word1" in context.markdown
+    assert context.tokens <= budget
+    assert count_tokens(context.markdown) <= budget
+
+
+def test_sections_past_the_budget_are_dropped():
+    docs = [Document(page_content=f"topic{i} " * 100, metadata={"source": f"/files/{i}.pdf", "page": 0})
+            for i in range(3)]
+
+    context = build_context(docs, token_budget=250)
+
+    assert context.chunks_used == 1
+    assert context.dropped == 2
+    assert context.tokens <= 250
@@ -0,0 +1,56 @@
+import fitz
+import pytest
+
+from utils.file_utils import has_ruling_lines
+
+
+@pytest.fixture
+def page():
+    with fitz.open() as document:
+        page = document.new_page()
+        page.insert_text((72, 72), "Quarterly report")
+        yield page
+
+
+def draw_grid(page, rows: int = 3, columns: int = 3, cell: float = 40):
+    for row in range(rows + 1):
+        page.draw_line((72, 100 + row * cell), (72 + columns * cell, 100 + row * cell))
+    for column in range(columns + 1):
+        page.draw_line((72 + column * cell, 100), (72 + column * cell, 100 + rows * cell))
+
+
+def test_text_only_page_has_no_rulings(page):
+    assert not has_ruling_lines(page)
+
+
+def test_background_rectangle_is_not_a_ruling(page):
+    page.draw_rect(page.rect, color=None, fill=(0.95, 0.95, 0.9), overlay=False)
+
+    assert not has_ruling_lines(page)
+
+
+def test_border_rectangle_is_not_a_ruling(page):
+    page.draw_rect(page.rect + (36, 36, -36, -36), color=(0, 0, 0), width=1)
+
+    assert not has_ruling_lines(page)
+
+
+def test_grid_lines_are_rulings(page):
+    page.draw_rect(page.rect, color=None, fill=(0.95, 0.95, 0.9), overlay=False)
+    draw_grid(page)
+
+    assert has_ruling_lines(page)
+
+
+def test_thin_rectangles_are_rulings(page):
+    for y in (100, 140, 180):
+        page.draw_rect(fitz.Rect(72, y, 400, y + 0.5), color=None, fill=(0, 0, 0))
+
+    assert has_ruling_lines(page)
+
+
+def test_row_of_shaded_cells_is_a_ruling(page):
+    for x in (72, 172, 272):
+        page.draw_rect(fitz.Rect(x, 100, x + 100, 120), color=None, fill=(0.8, 0.8, 0.8))
+
+    assert has_ruling_lines(page)
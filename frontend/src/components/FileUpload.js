@@ -28,6 +28,23 @@ function FileUpload({ onUpload }) {
 
       const data = await response.json();
       console.log('Upload response:', data);
+
+      // Processing runs in the background; poll the job until it finishes
+      let job;
+      do {
+        await new Promise((resolve) => setTimeout(resolve, 1000));
+        const jobResponse = await fetch(`http://localhost:8000/upload/jobs/${data.job_id}`);
+        if (!jobResponse.ok) {
+          throw new Error('Could not get processing status');
+        }
+        job = await jobResponse.json();
+        setUploadProgress(Math.round(job.progress * 100));
+      } while (job.status === 'queued' || job.status === 'running');
+
+      const failed = job.files.find((f) => f.stage === 'failed');
+      if (failed) {
+        throw new Error(failed.error || 'Processing failed');
+      }
       
       alert('File uploaded and processed with FAISS successfully!');
       onUpload(); // Refresh file list
@@ -66,7 +83,7 @@ function FileUpload({ onUpload }) {
       <Modal isOpen={uploading}>
         <h3 className="text-xl font-semibold mb-4 text-gray-800 dark:text-white">Processing Document</h3>
         <p className="text-gray-600 dark:text-gray-300 mb-4">
-          Please wait while we extract information and build search vectors...
+          Please wait while we extract information and build search vectors... {uploadProgress}%
         </p>
         <Loader />
       </Modal>